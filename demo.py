@@ -284,7 +284,7 @@ async def demo_advanced_rag():
         
         if not rag.initialized:
             print("WARNING: RAG system not fully initialized")
-            print("   Install dependencies: pip install chromadb sentence-transformers rank-bm25")
+            print("   Install dependencies: pip install chromadb sentence-transformers scipy")
             print("   Skipping RAG demos...\n")
             return False
         
@@ -337,7 +337,7 @@ async def demo_advanced_rag():
             
             # Check if BM25 index was built
             if hasattr(rag, 'bm25_index') and rag.bm25_index is not None:
-                print(f"PASS: BM25 index built with {len(rag.bm25_corpus)} documents\n")
+                print(f"PASS: BM25 index built with {len(rag.bm25_documents)} documents\n")
             else:
                 print("INFO: BM25 index not built (library may not be available)\n")
         else:
@@ -497,7 +497,7 @@ async def demo_advanced_rag():
         
     except ImportError as e:
         print(f"FAIL: RAG System not available: {e}")
-        print("   Install with: pip install chromadb sentence-transformers rank-bm25")
+        print("   Install with: pip install chromadb sentence-transformers scipy")
         return False
 
 
@@ -219,7 +219,6 @@ class EducationalNodes:
         # Generate detailed explanation
         # Phase 2: Use LLM if enabled, otherwise use rule-based
         if self.llm_manager:
-            import asyncio
             import nest_asyncio
             
             # Enable nested event loops
@@ -332,7 +331,6 @@ class EducationalNodes:
         """
         # Phase 2: Use Advanced RAG if available
         if self.rag_system and self.rag_system.initialized:
-            import asyncio
             import nest_asyncio
             
             # Enable nested event loops
@@ -443,7 +441,6 @@ class EducationalNodes:
         """
         # Phase 2: Use LLM if available for better practice problems
         if self.llm_manager:
-            import asyncio
             import nest_asyncio
             
             # Enable nested event loops
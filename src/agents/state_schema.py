@@ -9,7 +9,7 @@ from typing_extensions import TypedDict
 from langchain_core.messages import BaseMessage
 
 
-@dataclass
+@dataclass(slots=True)
 class StudentProfile:
     """Enhanced student profile with comprehensive learning data"""
     name: str = "Student"
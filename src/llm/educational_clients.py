@@ -5,6 +5,8 @@ Handles LLM-based content generation with OpenAI OR Ollama
 
 import os
 import logging
+import time
+import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -214,9 +216,6 @@ class EducationalLLMManager:
         Returns:
             Generated content as string
         """
-        import time
-        import asyncio
-        
         # Try OpenAI first
         if self.use_openai and self.openai_client:
             try:
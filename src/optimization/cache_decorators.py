@@ -5,11 +5,9 @@ Decorators for automatic caching
 from functools import wraps
 from typing import Callable, Any
 import asyncio
-import hashlib
-import json
 import logging
 
-from optimization.educational_caching import cache_manager
+from optimization.educational_caching import cache_manager, hash_cache_params
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +19,7 @@ def generate_cache_key(*args, **kwargs) -> str:
         "args": [str(arg) for arg in args],
         "kwargs": {k: str(v) for k, v in kwargs.items()}
     }
-    key_str = json.dumps(key_data, sort_keys=True)
-    return hashlib.md5(key_str.encode()).hexdigest()
+    return hash_cache_params(key_data)
 
 
 def cache_lesson(ttl: int = 3600):
@@ -3,10 +3,9 @@ Redis caching for educational content and session data
 """
 
 import os
-import json
 import redis
 import hashlib
-import pickle
+import orjson
 from typing import Optional, Any, Dict, List
 from datetime import timedelta
 import logging
@@ -16,6 +15,34 @@ from functools import wraps
 logger = logging.getLogger(__name__)
 
 
+def _json_default(value: Any) -> Any:
+    """Fallback for values orjson cannot encode natively (sets, custom objects)"""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+# NumPy scores (RAG results) stay numbers, and naive datetimes - this app's
+# utcnow() values - are written as UTC
+_SERIALIZE_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+
+
+def _serialize(value: Any) -> bytes:
+    """Encode a cache payload as JSON bytes"""
+    return orjson.dumps(value, default=_json_default, option=_SERIALIZE_OPTIONS)
+
+
+def _deserialize(data: bytes) -> Any:
+    """Decode a cache payload written by _serialize"""
+    return orjson.loads(data)
+
+
+def hash_cache_params(params: Any) -> str:
+    """Hash parameters into a short, order-independent cache key (16 hex chars)"""
+    canonical = orjson.dumps(params, default=_json_default, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(canonical, digest_size=8).hexdigest()
+
+
 class EducationalCacheManager:
     """Manages Redis caching for educational content"""
     
@@ -23,6 +50,7 @@ class EducationalCacheManager:
         self.redis_client = None
         self.default_ttl = 3600  # 1 hour default
         self.enabled = True
+        self.key_prefix = "tutor:"  # Namespace for every key this manager touches
         
     def initialize(self, redis_url: Optional[str] = None):
         """Initialize Redis connection"""
@@ -52,10 +80,7 @@ class EducationalCacheManager:
     
     def _generate_key(self, prefix: str, params: Dict[str, Any]) -> str:
         """Generate cache key from parameters"""
-        # Sort params for consistent keys
-        sorted_params = json.dumps(params, sort_keys=True)
-        hash_digest = hashlib.md5(sorted_params.encode()).hexdigest()
-        return f"tutor:{prefix}:{hash_digest}"
+        return f"{self.key_prefix}{prefix}:{hash_cache_params(params)}"
     
     def get_lesson(self, topic: str, level: str, learning_style: str) -> Optional[Dict]:
         """Get cached lesson plan"""
@@ -72,7 +97,7 @@ class EducationalCacheManager:
             cached = self.redis_client.get(key)
             if cached:
                 logger.info(f"Cache hit for lesson: {topic}")
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Cache get error: {e}")
         
@@ -91,7 +116,7 @@ class EducationalCacheManager:
         })
         
         try:
-            serialized = pickle.dumps(lesson_data)
+            serialized = _serialize(lesson_data)
             self.redis_client.setex(
                 key,
                 ttl or self.default_ttl,
@@ -117,7 +142,7 @@ class EducationalCacheManager:
             cached = self.redis_client.get(key)
             if cached:
                 logger.info(f"Cache hit for practice: {topic}")
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Cache get error: {e}")
         
@@ -136,7 +161,7 @@ class EducationalCacheManager:
         })
         
         try:
-            serialized = pickle.dumps(problems)
+            serialized = _serialize(problems)
             self.redis_client.setex(
                 key,
                 ttl or self.default_ttl,
@@ -162,7 +187,7 @@ class EducationalCacheManager:
             cached = self.redis_client.get(key)
             if cached:
                 logger.info(f"Cache hit for RAG: {query}")
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Cache get error: {e}")
         
@@ -181,7 +206,7 @@ class EducationalCacheManager:
         })
         
         try:
-            serialized = pickle.dumps(results)
+            serialized = _serialize(results)
             self.redis_client.setex(
                 key,
                 ttl or 1800,  # 30 minutes for RAG results
@@ -197,10 +222,10 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return
         
-        key = f"tutor:session:{session_id}"
+        key = f"{self.key_prefix}session:{session_id}"
         
         try:
-            serialized = pickle.dumps(session_data)
+            serialized = _serialize(session_data)
             self.redis_client.setex(key, ttl, serialized)
             logger.info(f"Cached session: {session_id}")
         except Exception as e:
@@ -211,12 +236,12 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return None
         
-        key = f"tutor:session:{session_id}"
+        key = f"{self.key_prefix}session:{session_id}"
         
         try:
             cached = self.redis_client.get(key)
             if cached:
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Get session error: {e}")
         
@@ -227,7 +252,7 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return 0
         
-        key = f"tutor:counter:{counter_name}"
+        key = f"{self.key_prefix}counter:{counter_name}"
         
         try:
             return self.redis_client.incrby(key, amount)
@@ -240,7 +265,7 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return 0
         
-        key = f"tutor:counter:{counter_name}"
+        key = f"{self.key_prefix}counter:{counter_name}"
         
         try:
             value = self.redis_client.get(key)
@@ -255,10 +280,10 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return
         
-        key = f"tutor:agent:{agent_name}:{input_hash}"
+        key = f"{self.key_prefix}agent:{agent_name}:{input_hash}"
         
         try:
-            serialized = pickle.dumps(response)
+            serialized = _serialize(response)
             self.redis_client.setex(
                 key,
                 ttl or 3600,  # 1 hour for agent responses
@@ -273,13 +298,13 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return None
         
-        key = f"tutor:agent:{agent_name}:{input_hash}"
+        key = f"{self.key_prefix}agent:{agent_name}:{input_hash}"
         
         try:
             cached = self.redis_client.get(key)
             if cached:
                 logger.debug(f"Cache hit for agent: {agent_name}")
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Get agent response error: {e}")
         
@@ -322,19 +347,28 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return
         
+        match = f"{self.key_prefix}{pattern}:*" if pattern else f"{self.key_prefix}*"
+        
         try:
-            if pattern:
-                # Clear specific pattern
-                keys = self.redis_client.keys(f"tutor:{pattern}:*")
-                if keys:
-                    self.redis_client.delete(*keys)
-                    logger.info(f"Cleared {len(keys)} cache entries matching pattern: {pattern}")
-            else:
-                # Clear all tutor cache
-                keys = self.redis_client.keys("tutor:*")
-                if keys:
-                    self.redis_client.delete(*keys)
-                    logger.info(f"Cleared all {len(keys)} cache entries")
+            # SCAN instead of KEYS so Redis is never blocked walking the keyspace;
+            # UNLINKs queue on one non-transactional pipeline and go out in one round trip
+            pipe = self.redis_client.pipeline(transaction=False)
+            cleared = 0
+            cursor = 0
+            while True:
+                cursor, batch = self.redis_client.scan(cursor, match=match, count=500)
+                if batch:
+                    pipe.unlink(*batch)
+                    cleared += len(batch)
+                if cursor == 0:
+                    break
+            
+            if cleared:
+                pipe.execute()
+                if pattern:
+                    logger.info(f"Cleared {cleared} cache entries matching pattern: {pattern}")
+                else:
+                    logger.info(f"Cleared all {cleared} cache entries")
         except Exception as e:
             logger.error(f"Clear cache error: {e}")
     
@@ -343,10 +377,10 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return
         
-        full_key = f"tutor:{key}"
+        full_key = f"{self.key_prefix}{key}"
         
         try:
-            serialized = pickle.dumps(value)
+            serialized = _serialize(value)
             self.redis_client.setex(full_key, ttl, serialized)
         except Exception as e:
             logger.error(f"Set sliding expiration error: {e}")
@@ -356,14 +390,14 @@ class EducationalCacheManager:
         if not self.redis_client or not self.enabled:
             return None
         
-        full_key = f"tutor:{key}"
+        full_key = f"{self.key_prefix}{key}"
         
         try:
             cached = self.redis_client.get(full_key)
             if cached:
                 # Refresh TTL
                 self.redis_client.expire(full_key, ttl)
-                return pickle.loads(cached)
+                return _deserialize(cached)
         except Exception as e:
             logger.error(f"Get sliding expiration error: {e}")
         
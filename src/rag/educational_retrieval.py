@@ -4,17 +4,534 @@ Advanced RAG (Retrieval-Augmented Generation) for Educational Content
 
 import os
 import re
+import copy
+import json
+import shutil
+import threading
+import weakref
 import logging
 import asyncio
-import math
 import string
+import functools
+import heapq
+from dataclasses import dataclass, field
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
+from collections import OrderedDict
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Vectorized BM25 backend (SciPy sparse)
+try:
+    from scipy.sparse import csr_matrix, vstack, save_npz, load_npz
+    BM25_AVAILABLE = True
+except ImportError:
+    BM25_AVAILABLE = False
+
+
+# Translation table stripping ASCII punctuation during BM25 tokenization
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+# HNSW settings applied when a collection is created. Search and build
+# breadth are raised from ChromaDB's defaults (search_ef=10, M=16) for
+# better recall on large corpora. The space stays squared L2, which the
+# score conversion and the in-process dense index assume; changing any of
+# these only affects newly created collections (re-index to apply)
+DEFAULT_HNSW_PARAMS = {
+    "hnsw:space": "l2",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+# Version of the persisted BM25 layout and tokenization. Bump whenever
+# either changes so indexes saved by older code are rebuilt, not reused
+BM25_INDEX_VERSION = 2
+
+# Documents per forward pass when embedding a corpus for indexing
+INDEX_EMBED_BATCH_SIZE = 64
+
+# Dynamically int8-quantized ONNX export shipped with the sentence-transformers models
+ONNX_QUANTIZED_FILE = "onnx/model_qint8_avx2.onnx"
+
+
+@functools.lru_cache(maxsize=4)
+def _get_embedder(model_name: str, device: str, onnx: bool = False):
+    """
+    Load a SentenceTransformer once per (model, device, backend) and share it across instances
+    
+    With onnx=True the int8-quantized ONNX Runtime graph is loaded instead of
+    the PyTorch weights, falling back to PyTorch if that is not possible
+    """
+    from sentence_transformers import SentenceTransformer
+    if onnx:
+        try:
+            return SentenceTransformer(
+                model_name,
+                device=device,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_QUANTIZED_FILE}
+            )
+        except Exception as e:
+            logger.warning(f"ONNX embedder unavailable, using PyTorch: {e}")
+    return SentenceTransformer(model_name, device=device)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_cross_encoder(model_name: str, device: str, fp16: bool = False, onnx: bool = False):
+    """
+    Load a CrossEncoder once per (model, device, precision, backend) and share it across instances
+    
+    With onnx=True the int8-quantized ONNX Runtime graph is loaded instead of
+    the PyTorch weights, falling back to PyTorch if that is not possible
+    """
+    from sentence_transformers import CrossEncoder
+    if onnx:
+        try:
+            return CrossEncoder(
+                model_name,
+                device=device,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_QUANTIZED_FILE}
+            )
+        except Exception as e:
+            logger.warning(f"ONNX cross-encoder unavailable, using PyTorch: {e}")
+    cross_encoder = CrossEncoder(model_name, device=device)
+    if fp16:
+        cross_encoder.model.half()
+    return cross_encoder
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into one batched call
+    Requests arriving within max_delay of each other share a forward pass
+    """
+    
+    def __init__(self, encode_fn, max_batch: int = 32, max_delay: float = 0.005):
+        """
+        Initialize the batcher
+        
+        Args:
+            encode_fn: Blocking function mapping a list of texts to a list of embeddings
+            max_batch: Flush as soon as this many texts are waiting
+            max_delay: Seconds to wait for more texts before flushing
+        """
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer = None
+        self._timer_loop = None  # Loop the pending flush timer belongs to
+        self._tasks = set()  # Keep in-flight batches referenced until done
+    
+    async def encode(self, text: str):
+        """
+        Embed a single text, batched with any concurrent callers
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding for the text
+        """
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is not loop:
+            self._reset(loop)
+        
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+            self._timer_loop = loop
+        
+        return await future
+    
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        """
+        Drop state left behind by an event loop that closed before its flush ran
+        Its timer will never fire, so keep only live requests from the running loop
+        """
+        self._timer.cancel()
+        self._timer = None
+        self._timer_loop = None
+        self._pending = [
+            (text, future) for text, future in self._pending
+            if not future.done() and future.get_loop() is loop
+        ]
+    
+    def _flush(self):
+        """Send all waiting texts to the encoder as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_loop = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Run one batched encode off the event loop and resolve each caller"""
+        try:
+            embeddings = await asyncio.to_thread(self.encode_fn, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+
+@dataclass(frozen=True, slots=True)
+class _BM25State:
+    """
+    One consistent version of a SparseBM25 index
+    add_documents builds a new state and swaps it in with a single assignment,
+    so a scorer running in a worker thread never mixes arrays from two versions
+    """
+    vocab: Dict[str, int]
+    tf: Any  # csr_matrix, (corpus_size, vocab size)
+    idf: "np.ndarray"
+    doc_len: "np.ndarray"
+    len_norm: "np.ndarray"
+    avgdl: float
+
+
+class SparseBM25:
+    """
+    Okapi BM25 scorer over a CSR term-frequency matrix
+    Produces the same scores as rank_bm25.BM25Okapi, but scores a query
+    with a handful of NumPy ops instead of a Python loop over the corpus
+    """
+    
+    def __init__(
+        self,
+        corpus: List[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ):
+        """
+        Build the term-frequency matrix and IDF table
+        
+        Args:
+            corpus: List of tokenized documents
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+            epsilon: Floor for negative IDF values (as a fraction of mean IDF)
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self._state = self._make_state(
+            {}, csr_matrix((0, 0), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        )
+        self.add_documents(corpus)
+    
+    @property
+    def vocab(self) -> Dict[str, int]:
+        return self._state.vocab
+    
+    @property
+    def tf(self):
+        return self._state.tf
+    
+    @property
+    def idf(self) -> "np.ndarray":
+        return self._state.idf
+    
+    @property
+    def doc_len(self) -> "np.ndarray":
+        return self._state.doc_len
+    
+    @property
+    def avgdl(self) -> float:
+        return self._state.avgdl
+    
+    @property
+    def corpus_size(self) -> int:
+        return self._state.tf.shape[0]
+    
+    def add_documents(self, corpus: List[List[str]]):
+        """
+        Append tokenized documents and refresh the corpus statistics
+        The current state is never modified; the new one replaces it atomically
+        
+        Args:
+            corpus: List of tokenized documents
+        """
+        state = self._state
+        vocab = dict(state.vocab)
+        
+        # Fill CSR arrays: one row per document, one column per term
+        indptr = [0]
+        indices = []
+        data = []
+        for doc in corpus:
+            counts: Dict[int, int] = {}
+            for token in doc:
+                col = vocab.setdefault(token, len(vocab))
+                counts[col] = counts.get(col, 0) + 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        
+        new_tf = csr_matrix(
+            (np.asarray(data, dtype=np.float32),
+             np.asarray(indices, dtype=np.int32),
+             np.asarray(indptr, dtype=np.int64)),
+            shape=(len(corpus), len(vocab))
+        )
+        old_tf = state.tf
+        if old_tf.shape[0]:
+            # Earlier rows gain (empty) columns for any new terms
+            widened = csr_matrix(
+                (old_tf.data, old_tf.indices, old_tf.indptr),
+                shape=(old_tf.shape[0], len(vocab))
+            )
+            tf = vstack([widened, new_tf], format='csr')
+        else:
+            tf = new_tf
+        
+        doc_len = np.concatenate([
+            state.doc_len, np.asarray([len(doc) for doc in corpus], dtype=np.float32)
+        ])
+        self._state = self._make_state(vocab, tf, doc_len)
+    
+    def _make_state(
+        self,
+        vocab: Dict[str, int],
+        tf,
+        doc_len: "np.ndarray",
+        idf: Optional["np.ndarray"] = None
+    ) -> _BM25State:
+        """
+        Derive length norms (and IDF, unless given) for a new state
+        
+        Args:
+            vocab: Term -> column
+            tf: Term-frequency matrix
+            doc_len: Document lengths
+            idf: Precomputed IDF table (optional)
+            
+        Returns:
+            The new state
+        """
+        corpus_size = tf.shape[0]
+        avgdl = float(doc_len.mean()) if corpus_size else 0.0
+        len_norm = self.k1 * (1 - self.b + self.b * doc_len / (avgdl or 1.0))
+        
+        if idf is None:
+            # IDF with BM25Okapi's epsilon floor for very common terms
+            doc_freq = np.bincount(tf.indices, minlength=len(vocab)).astype(np.float64)
+            idf = np.log(corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+            if len(idf):
+                floor = self.epsilon * idf.mean()
+                idf[idf < 0] = floor
+            idf = idf.astype(np.float32)
+        
+        return _BM25State(vocab, tf, idf, doc_len, len_norm, avgdl)
+    
+    def snapshot(self) -> "SparseBM25":
+        """Copy pinned to the current state; later add_documents calls don't affect it"""
+        return copy.copy(self)
+    
+    def save(self, directory: Path):
+        """
+        Write the index to a directory
+        
+        Args:
+            directory: Existing directory to write into
+        """
+        state = self._state
+        save_npz(directory / 'tf.npz', state.tf)
+        np.save(directory / 'idf.npy', state.idf)
+        np.save(directory / 'doc_len.npy', state.doc_len)
+        (directory / 'bm25.json').write_text(json.dumps({
+            'k1': self.k1,
+            'b': self.b,
+            'epsilon': self.epsilon,
+            'vocab': list(state.vocab)
+        }))
+    
+    @classmethod
+    def load(cls, directory: Path) -> "SparseBM25":
+        """
+        Load an index written by save(); IDF and lengths are memory-mapped
+        
+        Args:
+            directory: Directory the index was saved to
+            
+        Returns:
+            The loaded index
+        """
+        params = json.loads((directory / 'bm25.json').read_text())
+        index = cls.__new__(cls)
+        index.k1 = params['k1']
+        index.b = params['b']
+        index.epsilon = params['epsilon']
+        index._state = index._make_state(
+            {token: col for col, token in enumerate(params['vocab'])},
+            load_npz(directory / 'tf.npz').tocsr(),
+            np.load(directory / 'doc_len.npy', mmap_mode='r'),
+            idf=np.load(directory / 'idf.npy', mmap_mode='r')
+        )
+        return index
+    
+    def get_scores(self, query: List[str]) -> "np.ndarray":
+        """
+        Score every document against a tokenized query
+        
+        Args:
+            query: List of query tokens
+            
+        Returns:
+            Array of BM25 scores, one per document
+        """
+        state = self._state  # Read once - safe against a concurrent add_documents
+        
+        # Unknown terms contribute nothing; repeated terms count once per occurrence
+        q_idx = [state.vocab[token] for token in query if token in state.vocab]
+        if not q_idx:
+            return np.zeros(state.tf.shape[0], dtype=np.float32)
+        
+        tf_q = state.tf[:, q_idx].toarray()  # (N, Q), Q is small
+        weights = tf_q * (self.k1 + 1) / (tf_q + state.len_norm[:, None])
+        return weights @ state.idf[q_idx]
+
+
+class DocumentBuffer:
+    """
+    Append-only string store laid out as one UTF-8 buffer plus offsets
+    Avoids one Python str object per document for large corpora; strings
+    are decoded on access
+    """
+    
+    def __init__(self, texts: Optional[List[str]] = None):
+        self._buf = bytearray()
+        self._offsets = np.zeros(1, dtype=np.int64)  # offsets[i]:offsets[i+1] is item i
+        if texts:
+            self.extend(texts)
+    
+    def extend(self, texts: List[str]):
+        """Append a batch of strings"""
+        encoded = [text.encode('utf-8') for text in texts]
+        if not encoded:
+            return
+        ends = np.cumsum([len(chunk) for chunk in encoded], dtype=np.int64) + len(self._buf)
+        self._buf += b''.join(encoded)
+        self._offsets = np.concatenate([self._offsets, ends])
+    
+    def append(self, text: str):
+        """Append a single string"""
+        self.extend([text])
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("DocumentBuffer index out of range")
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return self._buf[start:end].decode('utf-8')
+    
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+    
+    def snapshot(self) -> "DocumentBuffer":
+        """Read-only copy of the buffer as it is now; extend() never touches it"""
+        frozen = DocumentBuffer()
+        frozen._buf = bytes(self._buf)
+        frozen._offsets = self._offsets  # extend() rebinds offsets, never writes them
+        return frozen
+    
+    def save(self, directory: Path, name: str):
+        """Write the buffer and its offsets as <name>.bin / <name>.offsets.npy"""
+        (directory / f'{name}.bin').write_bytes(self._buf)
+        np.save(directory / f'{name}.offsets.npy', self._offsets)
+    
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "DocumentBuffer":
+        """Load a buffer written by save(); offsets are memory-mapped"""
+        buffer = cls()
+        buffer._buf = bytearray((directory / f'{name}.bin').read_bytes())
+        buffer._offsets = np.load(directory / f'{name}.offsets.npy', mmap_mode='r')
+        return buffer
+
+
+@dataclass(frozen=True, slots=True)
+class _BM25Snapshot:
+    """
+    The BM25 corpus as of one point in time, taken on the event loop
+    Indexing keeps appending to the live structures while a worker thread
+    writes this copy to disk
+    """
+    generation: int
+    index: SparseBM25
+    documents: DocumentBuffer
+    ids: List[str]
+    metadatas: List[Dict[str, Any]]
+    dense_embeddings: Optional["np.ndarray"]
+
+
+@dataclass(slots=True)
+class RetrievedDoc:
+    """
+    A single search result as it moves through retrieval and fusion
+    
+    Slotted records keep per-result overhead low while hybrid search
+    builds and merges candidate lists. Public search methods hand
+    results out as dictionaries via to_dict().
+    """
+    id: Optional[str]
+    content: str
+    metadata: Dict[str, Any]
+    score: float
+    source: str
+    relevance: str = 'low'
+    bm25_raw_score: Optional[float] = None
+    combined_score: Optional[float] = None
+    semantic_score: Optional[float] = None
+    bm25_score: Optional[float] = None
+    semantic_rank: Optional[int] = None
+    bm25_rank: Optional[int] = None
+    rrf_score: Optional[float] = None
+    sources: List[str] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the dictionary shape returned by the search API"""
+        data = {
+            'id': self.id,
+            'content': self.content,
+            'metadata': self.metadata,
+            'score': self.score,
+            'relevance': self.relevance,
+            'source': self.source
+        }
+        for name in ('bm25_raw_score', 'combined_score', 'semantic_score',
+                     'bm25_score', 'semantic_rank', 'bm25_rank', 'rrf_score'):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.sources:
+            data['sources'] = self.sources
+        return data
+
 
 class EducationalRAG:
     """
@@ -25,7 +542,12 @@ class EducationalRAG:
     def __init__(
         self,
         persist_directory: str = "./chroma_db",
-        collection_name: str = "educational_content"
+        collection_name: str = "educational_content",
+        query_cache_size: int = 1024,
+        dense_index_threshold: int = 50000,
+        use_onnx: Optional[bool] = None,
+        collection_metadata: Optional[Dict[str, Any]] = None,
+        max_concurrent_queries: Optional[int] = None
     ):
         """
         Initialize Educational RAG system
@@ -33,20 +555,49 @@ class EducationalRAG:
         Args:
             persist_directory: Directory to persist vector database
             collection_name: Name of the collection
+            query_cache_size: Max queries kept in the token/embedding caches
+            dense_index_threshold: Corpora smaller than this are searched in-process
+                                   instead of through ChromaDB
+            use_onnx: Run the embedder as an int8 ONNX model on CPU
+                      (defaults to EMBEDDER_ONNX env var)
+            collection_metadata: HNSW settings for a newly created collection,
+                                 merged over DEFAULT_HNSW_PARAMS
+            max_concurrent_queries: ChromaDB queries allowed in worker threads
+                                    at once (defaults to the CPU count)
         """
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.chroma_client = None
         self.collection = None
         self.embedder = None
+        if use_onnx is None:
+            use_onnx = os.getenv('EMBEDDER_ONNX', 'false').lower() == 'true'
+        self.use_onnx = use_onnx
         self.initialized = False
         
         # BM25 components
-        self.bm25_index = None
-        self.bm25_corpus = []  # Store tokenized documents
-        self.bm25_documents = []  # Store original documents
+        self.bm25_available = BM25_AVAILABLE  # Whether the BM25 backend is importable
+        self.bm25_index = None  # Tokens live only in the index's CSR matrix
+        self.bm25_documents = DocumentBuffer()  # Store original documents
         self.bm25_metadatas = []  # Store document metadata
-        self.bm25_ids = []  # Store document IDs
+        self.bm25_ids: List[str] = []  # Store document IDs
+        self._id_rows: Dict[str, int] = {}  # Document ID -> corpus row
+        
+        # Subject/level filter columns as small-int codes (-1 = not set)
+        self._subject_vocab: Dict[str, int] = {}
+        self._level_vocab: Dict[str, int] = {'beginner': 0, 'intermediate': 1, 'advanced': 2}
+        self._subject_codes = np.zeros(0, dtype=np.int16)
+        self._level_codes = np.zeros(0, dtype=np.int16)
+        
+        # On-disk copy of the BM25 corpus and index, one directory per collection
+        self._bm25_dir = Path(persist_directory) / 'bm25' / collection_name
+        self._bm25_generation = 0  # Bumped per snapshot
+        self._saved_generation = 0  # Newest snapshot on disk
+        self._save_lock = threading.Lock()  # One save at a time, across loops and threads
+        
+        # In-process dense index, rows aligned with the BM25 corpus
+        self.dense_index_threshold = dense_index_threshold
+        self.dense_embeddings = None  # (N, D) float32, L2-normalized
         
         # Preprocessing settings
         self.stopwords = set([
@@ -57,6 +608,18 @@ class EducationalRAG:
             'why', 'how', 'can', 'could', 'would', 'should', 'may', 'might'
         ])
         
+        # Query caches - tutoring sessions repeat the same questions
+        self.query_cache_size = query_cache_size
+        self._query_tokens = functools.lru_cache(maxsize=query_cache_size)(self._query_tokens)
+        self._query_embeddings = OrderedDict()  # query -> embedding, LRU order
+        self._embedding_batcher = EmbeddingBatcher(self._encode_queries)
+        
+        # Bound concurrent ChromaDB queries so bursts don't drain the thread pool.
+        # One semaphore per event loop: a contended asyncio.Semaphore binds to
+        # the loop that first waited on it, and this instance is driven from several
+        self.max_concurrent_queries = max_concurrent_queries or os.cpu_count() or 1
+        self._loop_query_slots = weakref.WeakKeyDictionary()  # loop -> Semaphore
+        
         # Try to initialize ChromaDB
         try:
             import chromadb
@@ -73,20 +636,23 @@ class EducationalRAG:
                 self.collection = self.chroma_client.get_collection(name=collection_name)
                 logger.info(f"Loaded existing collection: {collection_name}")
                 
-                # CRITICAL: Rebuild BM25 index from existing documents
-                self._rebuild_bm25_from_collection()
+                # CRITICAL: Load the persisted BM25 index, or rebuild it from existing documents
+                if not self._load_bm25():
+                    self._rebuild_bm25_from_collection()
                 
             except:
                 self.collection = self.chroma_client.create_collection(
                     name=collection_name,
-                    metadata={"description": "Educational content for multi-agent tutor"}
+                    metadata={
+                        "description": "Educational content for multi-agent tutor",
+                        **DEFAULT_HNSW_PARAMS,
+                        **(collection_metadata or {})
+                    }
                 )
                 logger.info(f"Created new collection: {collection_name}")
             
             # Initialize embedder
             try:
-                from sentence_transformers import SentenceTransformer
-                
                 # Import device detection
                 try:
                     from utils.device_config import get_optimal_device
@@ -95,20 +661,23 @@ class EducationalRAG:
                     logger.warning("device_config not available, using cpu")
                     device = 'cpu'
                 
-                self.embedder = SentenceTransformer('all-MiniLM-L6-v2', device=device)
-                logger.info(f"Initialized sentence transformer embedder on {device.upper()}")
+                # Quantized ONNX only pays off on CPU; GPUs keep the PyTorch model
+                onnx = self.use_onnx and device == 'cpu'
+                self.embedder = _get_embedder('all-MiniLM-L6-v2', device, onnx)
+                logger.info(
+                    f"Initialized sentence transformer embedder on {device.upper()}"
+                    f"{' (ONNX int8)' if onnx else ''}"
+                )
                 
-                # Initialize BM25 if rank-bm25 is available
-                try:
-                    from rank_bm25 import BM25Okapi
-                    self.BM25Okapi = BM25Okapi
+                # Initialize BM25 if numpy/scipy are available
+                if self.bm25_available:
                     self.initialized = True
                     print("BM25 library loaded successfully - hybrid search available")
                     logger.info("BM25 initialized successfully - hybrid search available")
-                except ImportError as e:
-                    print(f"BM25 library not loaded: {e}")
-                    logger.warning("rank-bm25 not installed - hybrid search limited")
-                    logger.info("Install with: pip install rank-bm25")
+                else:
+                    print("BM25 library not loaded: numpy/scipy missing")
+                    logger.warning("scipy not installed - hybrid search limited")
+                    logger.info("Install with: pip install numpy scipy")
                     self.initialized = True  # Still allow semantic search
                     
             except ImportError:
@@ -117,7 +686,7 @@ class EducationalRAG:
                 
         except ImportError:
             logger.warning("ChromaDB not installed - advanced RAG features unavailable")
-            logger.info("Install with: pip install chromadb sentence-transformers rank-bm25")
+            logger.info("Install with: pip install chromadb sentence-transformers scipy")
             self.initialized = False
         except Exception as e:
             logger.error(f"Failed to initialize RAG system: {e}")
@@ -138,35 +707,90 @@ class EducationalRAG:
         Returns:
             List of processed tokens
         """
-        # Convert to lowercase
-        text = text.lower()
+        # Lowercase, strip punctuation and split - three C-level passes, no
+        # intermediate names; punctuation is deleted (not split on) so
+        # "don't" -> "dont" and "list.append" -> "listappend" as before
+        stopwords = self.stopwords
         
-        # Remove punctuation
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        # Remove short tokens and stopwords (cheap length check first)
+        return [
+            token for token in text.lower().translate(_PUNCTUATION_TABLE).split()
+            if len(token) > 2 and token not in stopwords
+        ]
+    
+    def _query_tokens(self, query: str) -> Tuple[str, ...]:
+        """
+        Tokenize a search query (memoized per instance in __init__)
         
-        # Split into tokens
-        tokens = text.split()
+        Args:
+            query: Search query
+            
+        Returns:
+            Tuple of processed tokens
+        """
+        return tuple(self._tokenize(query))
+    
+    def _query_slots(self) -> asyncio.Semaphore:
+        """ChromaDB query semaphore for the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        slots = self._loop_query_slots.get(loop)
+        if slots is None:
+            slots = self._loop_query_slots[loop] = asyncio.Semaphore(self.max_concurrent_queries)
+        return slots
+    
+    def _encode_queries(self, queries: List[str]):
+        """Encode a batch of queries with the current embedder (blocking)"""
+        return self.embedder.encode(queries, batch_size=len(queries))
+    
+    async def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        """
+        Get the embedding for a search query, reusing cached embeddings
         
-        # Remove stopwords and short tokens
-        tokens = [
-            token for token in tokens 
-            if token not in self.stopwords and len(token) > 2
-        ]
+        Args:
+            query: Search query
+            
+        Returns:
+            Read-only float32 query embedding, or None if the embedder is unavailable
+        """
+        if self.embedder is None:
+            return None
+        
+        # The MiniLM embedder is uncased and splits on whitespace, so queries
+        # differing only in case or spacing share one cache entry
+        key = ' '.join(query.lower().split())
+        cached = self._query_embeddings.get(key)
+        if cached is not None:
+            self._query_embeddings.move_to_end(key)
+            return cached
+        
+        try:
+            # Concurrent cache misses share one batched forward pass
+            embedding = await self._embedding_batcher.encode(key)
+            # Keep the encoder's float32 row instead of boxing it into a list;
+            # cached entries are shared, so freeze them
+            embedding = np.ascontiguousarray(embedding, dtype=np.float32)
+            embedding.flags.writeable = False
+        except Exception as e:
+            logger.warning(f"Query embedding failed, letting ChromaDB embed: {e}")
+            return None
         
-        return tokens
+        self._query_embeddings[key] = embedding
+        if len(self._query_embeddings) > self.query_cache_size:
+            self._query_embeddings.popitem(last=False)
+        return embedding
     
     def _rebuild_bm25_from_collection(self):
         """
         Rebuild BM25 index from existing ChromaDB collection
         Called on startup to ensure BM25 is synchronized with ChromaDB
         """
-        if not hasattr(self, 'BM25Okapi') or not self.collection:
+        if not self.bm25_available or not self.collection:
             return
         
         try:
             # Get all documents from collection
             result = self.collection.get(
-                include=['documents', 'metadatas']
+                include=['documents', 'metadatas', 'embeddings']
             )
             
             if result and result['documents']:
@@ -175,23 +799,26 @@ class EducationalRAG:
                 ids = result['ids'] if result['ids'] else [f"doc_{i}" for i in range(len(documents))]
                 
                 # Clear existing BM25 data
-                self.bm25_corpus = []
-                self.bm25_documents = []
+                self.bm25_index = None
+                self.bm25_documents = DocumentBuffer(documents)
                 self.bm25_metadatas = []
-                self.bm25_ids = []
-                
-                # Rebuild BM25 corpus
-                for doc_text, metadata, doc_id in zip(documents, metadatas, ids):
-                    tokenized_doc = self._tokenize(doc_text)
-                    self.bm25_corpus.append(tokenized_doc)
-                    self.bm25_documents.append(doc_text)
-                    self.bm25_metadatas.append(metadata)
-                    self.bm25_ids.append(doc_id)
+                self._subject_codes = np.zeros(0, dtype=np.int16)
+                self._level_codes = np.zeros(0, dtype=np.int16)
+                self._add_metadatas(metadatas)
+                self.bm25_ids = list(ids)
+                self._id_rows = {doc_id: row for row, doc_id in enumerate(ids)}
                 
                 # Build BM25 index
-                self._build_bm25_index()
+                self._build_bm25_index([self._tokenize(doc) for doc in documents])
+                
+                # Reload stored vectors into the in-process dense index
+                embeddings = result.get('embeddings')
+                self.dense_embeddings = None
+                if embeddings is not None and len(embeddings) == len(documents):
+                    self._extend_dense_index(np.asarray(embeddings), start_row=0)
                 
                 logger.info(f"Rebuilt BM25 index from {len(documents)} existing documents")
+                self._save_bm25(self._snapshot_bm25())
             else:
                 logger.info("No existing documents found - BM25 index will be built when content is added")
                 
@@ -200,11 +827,213 @@ class EducationalRAG:
             import traceback
             logger.error(traceback.format_exc())
     
-    def _build_bm25_index(self):
-        """Build or rebuild the BM25 index from current corpus"""
-        if hasattr(self, 'BM25Okapi') and self.bm25_corpus:
-            self.bm25_index = self.BM25Okapi(self.bm25_corpus)
-            logger.info(f"Built BM25 index with {len(self.bm25_corpus)} documents")
+    def _snapshot_bm25(self) -> Optional[_BM25Snapshot]:
+        """
+        Capture the BM25 corpus for _save_bm25
+        Call on the event loop, with no await since the corpus was last changed
+        
+        Returns:
+            The snapshot, or None if there is no index to save
+        """
+        if not self.bm25_available or self.bm25_index is None:
+            return None
+        
+        self._bm25_generation += 1
+        return _BM25Snapshot(
+            generation=self._bm25_generation,
+            index=self.bm25_index.snapshot(),
+            documents=self.bm25_documents.snapshot(),
+            ids=list(self.bm25_ids),
+            metadatas=list(self.bm25_metadatas),
+            dense_embeddings=self.dense_embeddings  # Replaced, never written, on extend
+        )
+    
+    def _save_bm25(self, snapshot: Optional[_BM25Snapshot]):
+        """
+        Persist a BM25 snapshot (index, corpus and dense vectors) under persist_directory
+        Files are written to a staging directory and swapped in, so arrays still
+        memory-mapped from the previous save stay valid; the manifest goes last
+        so an interrupted save is never loaded. Saves are serialized, and one
+        finishing after a newer snapshot was saved is dropped
+        
+        Args:
+            snapshot: Snapshot from _snapshot_bm25 (None does nothing)
+        """
+        if snapshot is None:
+            return
+        
+        with self._save_lock:
+            if snapshot.generation <= self._saved_generation:
+                return
+            
+            try:
+                directory = self._bm25_dir
+                staging = directory.with_name(directory.name + '.tmp')
+                shutil.rmtree(staging, ignore_errors=True)
+                staging.mkdir(parents=True)
+                
+                snapshot.index.save(staging)
+                snapshot.documents.save(staging, 'documents')
+                (staging / 'ids.json').write_text(json.dumps(snapshot.ids))
+                (staging / 'metadatas.json').write_text(json.dumps(snapshot.metadatas))
+                if snapshot.dense_embeddings is not None:
+                    np.save(staging / 'embeddings.npy', snapshot.dense_embeddings)
+                
+                directory.mkdir(parents=True, exist_ok=True)
+                manifest = directory / 'manifest.json'
+                manifest.unlink(missing_ok=True)
+                (directory / 'embeddings.npy').unlink(missing_ok=True)
+                for path in staging.iterdir():
+                    os.replace(path, directory / path.name)
+                staging.rmdir()
+                
+                count = len(snapshot.documents)
+                manifest.write_text(json.dumps({
+                    'version': BM25_INDEX_VERSION,
+                    'count': count
+                }))
+                self._saved_generation = snapshot.generation
+                logger.info(f"Saved BM25 index ({count} documents) to {directory}")
+            except Exception as e:
+                logger.warning(f"Failed to persist BM25 index: {e}")
+    
+    def _load_bm25(self) -> bool:
+        """
+        Load the persisted BM25 index if it matches the ChromaDB collection
+        
+        Returns:
+            True if loaded, False if it is missing or stale and must be rebuilt
+        """
+        if not self.bm25_available or not self.collection:
+            return False
+        
+        directory = self._bm25_dir
+        manifest = directory / 'manifest.json'
+        if not manifest.exists():
+            return False
+        
+        try:
+            info = json.loads(manifest.read_text())
+            count = info['count']
+            if info.get('version') != BM25_INDEX_VERSION:
+                logger.info("Persisted BM25 index was built by another version - rebuilding")
+                return False
+            if count != self.collection.count():
+                logger.info("Persisted BM25 index is out of date - rebuilding")
+                return False
+            
+            self.bm25_index = SparseBM25.load(directory)
+            self.bm25_documents = DocumentBuffer.load(directory, 'documents')
+            self.bm25_ids = json.loads((directory / 'ids.json').read_text())
+            self._id_rows = {doc_id: row for row, doc_id in enumerate(self.bm25_ids)}
+            self.bm25_metadatas = []
+            self._subject_codes = np.zeros(0, dtype=np.int16)
+            self._level_codes = np.zeros(0, dtype=np.int16)
+            self._add_metadatas(json.loads((directory / 'metadatas.json').read_text()))
+            dense_file = directory / 'embeddings.npy'
+            self.dense_embeddings = np.load(dense_file, mmap_mode='r') if dense_file.exists() else None
+            
+            logger.info(f"Loaded persisted BM25 index with {count} documents")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load persisted BM25 index: {e}")
+            self.bm25_index = None
+            return False
+    
+    def _extend_dense_index(self, embeddings: Optional["np.ndarray"], start_row: int):
+        """
+        Append document embeddings to the in-process dense index
+        The index is dropped if its rows would no longer line up with the corpus
+        
+        Args:
+            embeddings: (n, D) embeddings for the new documents, or None
+            start_row: Corpus row of the first new document
+        """
+        if embeddings is None:
+            self.dense_embeddings = None
+            return
+        
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        
+        if start_row == 0:
+            self.dense_embeddings = embeddings
+        elif self.dense_embeddings is not None and len(self.dense_embeddings) == start_row:
+            self.dense_embeddings = np.vstack([self.dense_embeddings, embeddings])
+        else:
+            self.dense_embeddings = None
+    
+    def _add_metadatas(self, metadatas: List[Optional[Dict[str, Any]]]):
+        """
+        Append document metadata and its subject/level filter codes
+        
+        Args:
+            metadatas: Metadata dicts, in corpus order
+        """
+        subjects = []
+        levels = []
+        for metadata in metadatas:
+            metadata = metadata or {}
+            self.bm25_metadatas.append(metadata)
+            subjects.append(self._encode_label(self._subject_vocab, metadata.get('subject')))
+            levels.append(self._encode_label(self._level_vocab, metadata.get('level')))
+        self._subject_codes = np.concatenate([self._subject_codes, np.asarray(subjects, dtype=np.int16)])
+        self._level_codes = np.concatenate([self._level_codes, np.asarray(levels, dtype=np.int16)])
+    
+    @staticmethod
+    def _encode_label(vocab: Dict[str, int], label: Optional[str]) -> int:
+        """Integer code for a metadata label, adding it to the vocabulary if new"""
+        if label is None:
+            return -1
+        return vocab.setdefault(label, len(vocab))
+    
+    def _criteria_mask(
+        self,
+        subject: Optional[str],
+        level: Optional[str]
+    ) -> Optional["np.ndarray"]:
+        """
+        Boolean mask of corpus rows matching the subject and level filters
+        
+        Args:
+            subject: Filter by subject (optional)
+            level: Filter by level (optional)
+            
+        Returns:
+            Mask aligned with the corpus, or None when no filter is set
+        """
+        if not subject and not level:
+            return None
+        mask = np.ones(len(self._subject_codes), dtype=bool)
+        if subject:
+            mask &= self._subject_codes == self._subject_vocab.get(subject, -2)
+        if level:
+            mask &= self._level_codes == self._level_vocab.get(level, -2)
+        return mask
+    
+    def _use_dense_index(self) -> bool:
+        """Whether semantic search can be served from the in-process dense index"""
+        return (
+            self.dense_embeddings is not None
+            and len(self.dense_embeddings) == len(self.bm25_documents)
+            and len(self.dense_embeddings) < self.dense_index_threshold
+        )
+    
+    def _build_bm25_index(self, tokenized_docs: List[List[str]]):
+        """
+        Add tokenized documents to the BM25 index, creating it on first use
+        
+        Args:
+            tokenized_docs: Tokenized documents, in corpus order
+        """
+        if not self.bm25_available or not tokenized_docs:
+            return
+        if self.bm25_index is None:
+            self.bm25_index = SparseBM25(tokenized_docs)
+        else:
+            self.bm25_index.add_documents(tokenized_docs)
+        logger.info(f"Built BM25 index with {self.bm25_index.corpus_size} documents")
     
     async def index_educational_content(
         self,
@@ -224,7 +1053,6 @@ class EducationalRAG:
             return False
         
         try:
-            import asyncio
             logger.info(f"Indexing {len(content_list)} educational resources")
             
             # Prepare documents for ChromaDB
@@ -233,34 +1061,59 @@ class EducationalRAG:
             ids = []
             
             for idx, content in enumerate(content_list):
-                doc_text = content.get('text', '')
-                doc_metadata = content.get('metadata', {})
-                doc_id = content.get('id', f"doc_{idx}")
-                
-                documents.append(doc_text)
-                metadatas.append(doc_metadata)
-                ids.append(doc_id)
-                
-                # Also prepare for BM25 indexing
-                if hasattr(self, 'BM25Okapi'):
-                    tokenized_doc = self._tokenize(doc_text)
-                    self.bm25_corpus.append(tokenized_doc)
-                    self.bm25_documents.append(doc_text)
-                    self.bm25_metadatas.append(doc_metadata)
-                    self.bm25_ids.append(doc_id)
+                documents.append(content.get('text', ''))
+                metadatas.append(content.get('metadata', {}))
+                ids.append(content.get('id', f"doc_{idx}"))
+            
+            # Embed once with our embedder so ChromaDB and the dense index share vectors
+            embeddings = None
+            if self.embedder is not None:
+                try:
+                    embeddings = await asyncio.to_thread(
+                        self.embedder.encode,
+                        documents,
+                        batch_size=INDEX_EMBED_BATCH_SIZE,
+                        show_progress_bar=False,
+                        convert_to_numpy=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Document embedding failed, letting ChromaDB embed: {e}")
             
             # Add to ChromaDB collection - wrap blocking call in thread pool
+            add_kwargs = {'embeddings': np.asarray(embeddings).tolist()} if embeddings is not None else {}
             await asyncio.to_thread(
                 self.collection.add,
                 documents=documents,
                 metadatas=metadatas,
-                ids=ids
+                ids=ids,
+                **add_kwargs
             )
             
-            # Build BM25 index if available
-            if hasattr(self, 'BM25Okapi'):
-                self._build_bm25_index()
-                logger.info(f"Indexed {len(content_list)} documents in both ChromaDB and BM25")
+            # Extend the corpus, filter codes, dense index and BM25 together, with no
+            # await in between, so concurrent searches never see rows out of step
+            if self.bm25_available:
+                # ChromaDB ignores IDs it already holds, so skip them here too
+                start_row = len(self.bm25_documents)
+                fresh = []
+                for position, doc_id in enumerate(ids):
+                    if doc_id not in self._id_rows:
+                        self._id_rows[doc_id] = start_row + len(fresh)
+                        fresh.append(position)
+                if len(fresh) < len(ids):
+                    logger.info(f"Skipped {len(ids) - len(fresh)} documents already indexed")
+                
+                if fresh:
+                    documents = [documents[i] for i in fresh]
+                    self.bm25_documents.extend(documents)
+                    self._add_metadatas([metadatas[i] for i in fresh])
+                    self.bm25_ids.extend([ids[i] for i in fresh])
+                    if embeddings is not None:
+                        embeddings = np.asarray(embeddings)[fresh]
+                    self._extend_dense_index(embeddings, start_row)
+                    self._build_bm25_index([self._tokenize(doc) for doc in documents])
+                    snapshot = self._snapshot_bm25()
+                    await asyncio.to_thread(self._save_bm25, snapshot)
+                logger.info(f"Indexed {len(fresh)} documents in both ChromaDB and BM25")
             else:
                 logger.info(f"Indexed {len(content_list)} documents in ChromaDB only")
             
@@ -275,7 +1128,8 @@ class EducationalRAG:
         query: str,
         subject: Optional[str] = None,
         student_level: Optional[str] = None,
-        top_k: int = 5
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant educational content using semantic search
@@ -285,16 +1139,28 @@ class EducationalRAG:
             subject: Filter by subject (optional)
             student_level: Filter by difficulty level (optional)
             top_k: Number of results to return
+            query_embedding: Precomputed query embedding (optional, skips encoding)
             
         Returns:
             List of relevant content dictionaries
         """
+        docs = await self._semantic_docs(query, subject, student_level, top_k, query_embedding)
+        return [doc.to_dict() for doc in docs]
+    
+    async def _semantic_docs(
+        self,
+        query: str,
+        subject: Optional[str] = None,
+        student_level: Optional[str] = None,
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[RetrievedDoc]:
+        """Semantic search returning result records (see retrieve_educational_content)"""
         if not self.initialized:
             logger.warning("RAG not initialized - returning empty results")
             return []
         
         try:
-            import asyncio
             logger.info(f"Retrieving educational content for: {query}")
             
             # Build where clause for filtering (ChromaDB format)
@@ -311,40 +1177,59 @@ class EducationalRAG:
             elif student_level:
                 where_clause = {"level": {"$eq": student_level}}
             
-            # Query the collection - wrap blocking call in thread pool
-            results = await asyncio.to_thread(
-                self.collection.query,
-                query_texts=[query],
-                n_results=top_k,
-                where=where_clause
-            )
+            # Use the given or cached query embedding when available, else let ChromaDB embed
+            if query_embedding is None:
+                query_embedding = await self._embed_query(query)
+            if query_embedding is not None:
+                query_input = {'query_embeddings': [query_embedding]}
+            else:
+                query_input = {'query_texts': [query]}
+            
+            hits = []
+            if query_embedding is not None and self._use_dense_index():
+                # Small corpus - score in-process and skip the ChromaDB round-trip
+                hits = await asyncio.to_thread(
+                    self._dense_search, query_embedding, subject, student_level, top_k
+                )
+            else:
+                # Query the collection - wrap blocking call in thread pool
+                async with self._query_slots():
+                    results = await asyncio.to_thread(
+                        self.collection.query,
+                        n_results=top_k,
+                        where=where_clause,
+                        **query_input
+                    )
+                
+                if results and results['documents'] and len(results['documents']) > 0:
+                    documents = results['documents'][0]
+                    metadatas = results['metadatas'][0] if results['metadatas'] else [{}] * len(documents)
+                    distances = results['distances'][0] if results['distances'] else [0] * len(documents)
+                    doc_ids = results['ids'][0] if results.get('ids') else [None] * len(documents)
+                    hits = zip(doc_ids, documents, metadatas, distances)
             
             # Format results
             retrieved_content = []
-            if results and results['documents'] and len(results['documents']) > 0:
-                documents = results['documents'][0]
-                metadatas = results['metadatas'][0] if results['metadatas'] else [{}] * len(documents)
-                distances = results['distances'][0] if results['distances'] else [0] * len(documents)
+            for doc_id, doc, metadata, distance in hits:
+                # Convert L2 distance to similarity score
+                score = 1.0 / (1.0 + distance)
                 
-                for doc, metadata, distance in zip(documents, metadatas, distances):
-                    # Convert L2 distance to similarity score
-                    score = 1.0 / (1.0 + distance)
-                    
-                    # Determine relevance based on score
-                    if score > 0.66:
-                        relevance = 'high'
-                    elif score > 0.33:
-                        relevance = 'medium'
-                    else:
-                        relevance = 'low'
-                    
-                    retrieved_content.append({
-                        'content': doc,
-                        'metadata': metadata,
-                        'score': score,
-                        'relevance': relevance,
-                        'source': 'semantic'
-                    })
+                # Determine relevance based on score
+                if score > 0.66:
+                    relevance = 'high'
+                elif score > 0.33:
+                    relevance = 'medium'
+                else:
+                    relevance = 'low'
+                
+                retrieved_content.append(RetrievedDoc(
+                    id=doc_id,
+                    content=doc,
+                    metadata=metadata,
+                    score=score,
+                    relevance=relevance,
+                    source='semantic'
+                ))
             
             logger.info(f"Retrieved {len(retrieved_content)} relevant documents via semantic search")
             return retrieved_content
@@ -353,10 +1238,61 @@ class EducationalRAG:
             logger.error(f"Failed to retrieve content: {e}")
             return []
     
+    def _dense_search(
+        self,
+        query_embedding: np.ndarray,
+        subject: Optional[str],
+        student_level: Optional[str],
+        top_k: int
+    ) -> List[Tuple[str, str, Dict, float]]:
+        """
+        Nearest-neighbour search over the in-process dense index
+        
+        Args:
+            query_embedding: Query embedding
+            subject: Filter by subject (optional)
+            student_level: Filter by difficulty level (optional)
+            top_k: Number of results to return
+            
+        Returns:
+            List of (id, document, metadata, distance) tuples, closest first.
+            Distances are squared L2, matching ChromaDB's default space
+        """
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+        similarities = self.dense_embeddings @ query_vec
+        
+        # Apply metadata filters by masking out non-matching rows
+        mask = self._criteria_mask(subject, student_level)
+        if mask is not None:
+            mask = mask[:len(similarities)]
+            similarities = np.where(mask, similarities, -np.inf)
+            k = min(top_k, int(mask.sum()))
+        else:
+            k = min(top_k, len(similarities))
+        
+        if k <= 0:
+            return []
+        
+        candidates = np.argpartition(similarities, -k)[-k:]
+        top_indices = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        
+        # For unit vectors, squared L2 distance = 2 - 2 * cosine similarity
+        return [
+            (
+                self.bm25_ids[idx],
+                self.bm25_documents[idx],
+                self.bm25_metadatas[idx],
+                max(0.0, 2.0 - 2.0 * float(similarities[idx]))
+            )
+            for idx in top_indices
+        ]
+    
     async def semantic_search(
         self,
         query: str,
-        top_k: int = 10
+        top_k: int = 10,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search using embeddings
@@ -364,16 +1300,21 @@ class EducationalRAG:
         Args:
             query: Search query
             top_k: Number of results
+            query_embedding: Precomputed query embedding (optional, skips encoding)
             
         Returns:
             List of semantically similar content
         """
-        return await self.retrieve_educational_content(query, top_k=top_k)
+        return await self.retrieve_educational_content(
+            query, top_k=top_k, query_embedding=query_embedding
+        )
     
     async def keyword_search(
         self,
         query: str,
-        top_k: int = 10
+        top_k: int = 10,
+        subject: Optional[str] = None,
+        student_level: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform keyword-based search using BM25
@@ -381,42 +1322,65 @@ class EducationalRAG:
         Args:
             query: Search query
             top_k: Number of results
+            subject: Filter by subject (optional)
+            student_level: Filter by difficulty level (optional)
             
         Returns:
             List of keyword-matched content
         """
-        if not hasattr(self, 'BM25Okapi') or not self.bm25_index:
+        docs = await self._keyword_docs(query, top_k, subject, student_level)
+        return [doc.to_dict() for doc in docs]
+    
+    async def _keyword_docs(
+        self,
+        query: str,
+        top_k: int = 10,
+        subject: Optional[str] = None,
+        student_level: Optional[str] = None,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[RetrievedDoc]:
+        """
+        BM25 search returning result records (see keyword_search)
+        query_embedding is only used by the semantic fallback
+        """
+        if not self.bm25_available or not self.bm25_index:
             logger.info("BM25 not available - using semantic search as fallback")
-            return await self.semantic_search(query, top_k)
+            return await self._semantic_docs(query, subject, student_level, top_k, query_embedding)
         
         try:
             logger.info(f"Performing BM25 keyword search for: {query}")
             
             # Tokenize query using same preprocessing as documents
-            tokenized_query = self._tokenize(query)
+            tokenized_query = self._query_tokens(query)
             
-            # Get BM25 scores
-            scores = self.bm25_index.get_scores(tokenized_query)
+            # Score off the event loop so the semantic branch can run alongside
+            top_indices, selected = await asyncio.to_thread(
+                self._bm25_top_k, tokenized_query, top_k, subject, student_level
+            )
             
-            # Get top-k indices
-            top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
+            # Normalize BM25 score (typically ranges from 0 to ~10-20)
+            # Using sigmoid-like normalization for better 0-1 mapping
+            normalized = 1.0 - np.exp(-selected / 10, dtype=np.float64)
+            relevance = np.where(
+                normalized > 0.5, 'high', np.where(normalized > 0.2, 'medium', 'low')
+            )
             
             # Build results
-            keyword_results = []
-            for idx in top_indices:
-                if scores[idx] > 0:  # Only include documents with positive scores
-                    # Normalize BM25 score (typically ranges from 0 to ~10-20)
-                    # Using sigmoid-like normalization for better 0-1 mapping
-                    normalized_score = 1 - math.exp(-scores[idx] / 10)
-                    
-                    keyword_results.append({
-                        'content': self.bm25_documents[idx],
-                        'metadata': self.bm25_metadatas[idx] if idx < len(self.bm25_metadatas) else {},
-                        'score': normalized_score,
-                        'bm25_raw_score': float(scores[idx]),
-                        'relevance': 'high' if normalized_score > 0.5 else 'medium' if normalized_score > 0.2 else 'low',
-                        'source': 'bm25'
-                    })
+            keyword_results = [
+                RetrievedDoc(
+                    id=self.bm25_ids[idx],
+                    content=self.bm25_documents[idx],
+                    metadata=self.bm25_metadatas[idx] if idx < len(self.bm25_metadatas) else {},
+                    score=score,
+                    bm25_raw_score=raw_score,
+                    relevance=label,
+                    source='bm25'
+                )
+                for idx, score, raw_score, label in zip(
+                    top_indices.tolist(), normalized.tolist(),
+                    selected.astype(np.float64).tolist(), relevance.tolist()
+                )
+            ]
             
             logger.info(f"Retrieved {len(keyword_results)} documents via BM25 search")
             return keyword_results
@@ -424,7 +1388,48 @@ class EducationalRAG:
         except Exception as e:
             logger.error(f"BM25 search failed: {e}")
             logger.info("Falling back to semantic search")
-            return await self.semantic_search(query, top_k)
+            return await self._semantic_docs(query, subject, student_level, top_k, query_embedding)
+    
+    def _bm25_top_k(
+        self,
+        tokenized_query: Tuple[str, ...],
+        top_k: int,
+        subject: Optional[str],
+        student_level: Optional[str]
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Score the corpus and select the best positive-scoring documents
+        
+        Args:
+            tokenized_query: Query tokens
+            top_k: Number of results
+            subject: Filter by subject (optional)
+            student_level: Filter by difficulty level (optional)
+            
+        Returns:
+            (row indices, raw BM25 scores), best first
+        """
+        # Get BM25 scores
+        scores = self.bm25_index.get_scores(tokenized_query)
+        
+        # Drop documents outside the subject/level filters before ranking
+        # Codes may already cover rows appended after this score snapshot
+        mask = self._criteria_mask(subject, student_level)
+        if mask is not None:
+            scores[~mask[:len(scores)]] = -np.inf
+        
+        # Get top-k indices: partial partition, then sort only the k winners
+        k = min(top_k, len(scores))
+        if k <= 0:
+            top_indices = np.zeros(0, dtype=np.int64)
+        else:
+            candidates = np.argpartition(scores, -k)[-k:]
+            top_indices = candidates[np.argsort(-scores[candidates], kind='stable')]
+        
+        # Only include documents with positive scores
+        selected = scores[top_indices]
+        positive = selected > 0
+        return top_indices[positive], selected[positive]
     
     async def hybrid_search(
         self,
@@ -434,7 +1439,8 @@ class EducationalRAG:
         top_k: int = 10,
         semantic_weight: float = 0.5,
         bm25_weight: float = 0.5,
-        fusion_method: str = "weighted"  # "weighted" or "rrf"
+        fusion_method: str = "weighted",  # "weighted" or "rrf"
+        score_normalization: Optional[str] = None  # None or "minmax"
     ) -> List[Dict[str, Any]]:
         """
         True hybrid search combining semantic and BM25 keyword search
@@ -447,6 +1453,10 @@ class EducationalRAG:
             semantic_weight: Weight for semantic results (0-1)
             bm25_weight: Weight for BM25 results (0-1)
             fusion_method: Method to combine results ("weighted" or "rrf")
+            score_normalization: "minmax" rescales each branch's scores to 0-1
+                                 within this query before weighting (weighted
+                                 fusion only); None keeps each branch's fixed
+                                 0-1 mapping, so scores compare across queries
             
         Returns:
             List of combined search results
@@ -463,14 +1473,20 @@ class EducationalRAG:
                 semantic_weight = 0.5
                 bm25_weight = 0.5
             
+            # Embed the query once; both branches (and the keyword branch's
+            # semantic fallback) reuse it
+            query_embedding = await self._embed_query(query)
+            
             # Run both searches in parallel
             semantic_task = asyncio.create_task(
-                self.retrieve_educational_content(
-                    query, subject, student_level, top_k * 2
+                self._semantic_docs(
+                    query, subject, student_level, top_k * 2, query_embedding
                 )
             )
             keyword_task = asyncio.create_task(
-                self.keyword_search(query, top_k * 2)
+                self._keyword_docs(
+                    query, top_k * 2, subject, student_level, query_embedding
+                )
             )
             
             # Wait for both to complete
@@ -479,24 +1495,28 @@ class EducationalRAG:
             )
             
             # Combine results based on method
+            # Filters and top_k are applied during fusion
             if fusion_method == "rrf":
                 combined = self._reciprocal_rank_fusion(
                     semantic_results, 
                     keyword_results,
-                    k=60  # RRF parameter
+                    k=60,  # RRF parameter
+                    subject=subject,
+                    level=student_level,
+                    top_k=top_k
                 )
             else:  # weighted
                 combined = self._weighted_fusion(
                     semantic_results,
                     keyword_results,
                     semantic_weight,
-                    bm25_weight
+                    bm25_weight,
+                    subject=subject,
+                    level=student_level,
+                    top_k=top_k,
+                    normalization=score_normalization
                 )
             
-            # Filter by subject and level if specified
-            if subject or student_level:
-                combined = self._filter_by_criteria(combined, subject, student_level)
-            
             # Return top_k results
             final_results = combined[:top_k]
             
@@ -509,7 +1529,7 @@ class EducationalRAG:
                 f"Final: {len(final_results)}"
             )
             
-            return final_results
+            return [doc.to_dict() for doc in final_results]
             
         except Exception as e:
             logger.error(f"Hybrid search failed: {e}")
@@ -518,82 +1538,157 @@ class EducationalRAG:
                 query, subject, student_level, top_k
             )
     
+    @staticmethod
+    def _result_key(result: RetrievedDoc) -> str:
+        """Dedup key for fusion: document ID, or content if the result has no ID"""
+        return result.id or result.content
+    
+    def _merge_candidates(
+        self,
+        semantic_results: List[RetrievedDoc],
+        keyword_results: List[RetrievedDoc],
+        subject: Optional[str] = None,
+        level: Optional[str] = None
+    ) -> Tuple[List[RetrievedDoc], "np.ndarray", "np.ndarray"]:
+        """
+        Deduplicate both result lists into one record per document
+        
+        Args:
+            semantic_results: Results from semantic search
+            keyword_results: Results from BM25 search
+            subject: Keep only results for this subject (optional)
+            level: Keep only results at this level (optional)
+            
+        Returns:
+            (records, ranks, scores). ranks and scores are (n, 2) arrays with
+            one column per list (semantic, BM25); rank 0 means "not in list".
+            Ranks are positions in the unfiltered input lists. Records' sources
+            are left for the fusion method to set on the top_k survivors
+        """
+        docs: List[RetrievedDoc] = []
+        positions: Dict[str, int] = {}
+        ranks: List[List[int]] = []
+        scores: List[List[float]] = []
+        filtering = bool(subject or level)
+        
+        for column, results in enumerate((semantic_results, keyword_results)):
+            for rank, result in enumerate(results, 1):
+                if filtering and not self._matches_criteria(result, subject, level):
+                    continue
+                key = self._result_key(result)
+                row = positions.get(key)
+                if row is None:
+                    row = positions[key] = len(docs)
+                    docs.append(result)
+                    ranks.append([0, 0])
+                    scores.append([0.0, 0.0])
+                if ranks[row][column] == 0:
+                    ranks[row][column] = rank
+                    scores[row][column] = result.score
+        
+        return (
+            docs,
+            np.asarray(ranks, dtype=np.int64).reshape(-1, 2),
+            np.asarray(scores, dtype=np.float64).reshape(-1, 2)
+        )
+    
+    @staticmethod
+    def _label_sources(docs: List[RetrievedDoc], present: "np.ndarray"):
+        """Set sources on fused records from their rows of the (n, 2) presence mask"""
+        for doc, (semantic, bm25) in zip(docs, present.tolist()):
+            doc.sources = ['semantic'] * semantic + ['bm25'] * bm25
+    
+    @staticmethod
+    def _top_rows(values: "np.ndarray", top_k: Optional[int]) -> "np.ndarray":
+        """
+        Row indices of the top_k largest values, best first
+        A full stable sort so tied scores (common in RRF) keep input order;
+        fusion sees at most a few times top_k rows, so a partial sort saves nothing
+        """
+        order = np.argsort(-values, kind='stable')
+        return order if top_k is None else order[:max(top_k, 0)]
+    
+    @staticmethod
+    def _minmax_columns(scores: "np.ndarray", present: "np.ndarray") -> "np.ndarray":
+        """
+        Min-max scale each column to 0-1 over the rows present in that list
+        A column whose scores are all equal maps to 1.0 rather than dividing by zero
+        """
+        low = np.where(present, scores, np.inf).min(axis=0)
+        high = np.where(present, scores, -np.inf).max(axis=0)
+        span = high - low
+        spread = span > 1e-9
+        scaled = np.where(spread, (scores - low) / np.where(spread, span, 1.0), 1.0)
+        return np.where(present, scaled, 0.0)
+    
+    @staticmethod
+    def _label_relevance(docs: List[RetrievedDoc], combined: "np.ndarray"):
+        """Set combined_score and relevance on fused records"""
+        labels = np.where(combined > 0.6, 'high', np.where(combined > 0.3, 'medium', 'low'))
+        for doc, score, label in zip(docs, combined.tolist(), labels.tolist()):
+            doc.combined_score = score
+            doc.relevance = label
+    
     def _weighted_fusion(
         self,
-        semantic_results: List[Dict],
-        keyword_results: List[Dict],
+        semantic_results: List[RetrievedDoc],
+        keyword_results: List[RetrievedDoc],
         semantic_weight: float,
-        keyword_weight: float
-    ) -> List[Dict]:
+        keyword_weight: float,
+        subject: Optional[str] = None,
+        level: Optional[str] = None,
+        top_k: Optional[int] = None,
+        normalization: Optional[str] = None
+    ) -> List[RetrievedDoc]:
         """
         Combine results using weighted score fusion
+        Scores are combined and ranked as NumPy arrays over the merged candidates
         
         Args:
             semantic_results: Results from semantic search
             keyword_results: Results from BM25 search
             semantic_weight: Weight for semantic scores
             keyword_weight: Weight for BM25 scores
+            subject: Keep only results for this subject (optional)
+            level: Keep only results at this level (optional)
+            top_k: Number of results to keep (optional, default all)
+            normalization: "minmax" to rescale each list's scores before weighting
             
         Returns:
-            Combined and sorted results
+            Combined and sorted results. semantic_score/bm25_score keep each
+            branch's own score; only combined_score reflects the normalization
         """
-        combined_dict = {}
-        
-        # Add semantic results
-        for result in semantic_results:
-            content = result['content']
-            score = result.get('score', 0) * semantic_weight
-            combined_dict[content] = {
-                **result,
-                'combined_score': score,
-                'semantic_score': result.get('score', 0),
-                'sources': ['semantic']
-            }
-        
-        # Add/update with keyword results
-        for result in keyword_results:
-            content = result['content']
-            score = result.get('score', 0) * keyword_weight
-            
-            if content in combined_dict:
-                # Document found in both - combine scores
-                combined_dict[content]['combined_score'] += score
-                combined_dict[content]['bm25_score'] = result.get('score', 0)
-                combined_dict[content]['sources'].append('bm25')
-            else:
-                # Document only in BM25
-                combined_dict[content] = {
-                    **result,
-                    'combined_score': score,
-                    'bm25_score': result.get('score', 0),
-                    'sources': ['bm25']
-                }
-        
-        # Sort by combined score
-        combined = sorted(
-            combined_dict.values(),
-            key=lambda x: x['combined_score'],
-            reverse=True
+        docs, ranks, scores = self._merge_candidates(
+            semantic_results, keyword_results, subject, level
+        )
+        present = ranks > 0
+        weighted = self._minmax_columns(scores, present) if normalization == "minmax" else scores
+        combined = (
+            np.where(present[:, 0], weighted[:, 0] * semantic_weight, 0.0)
+            + np.where(present[:, 1], weighted[:, 1] * keyword_weight, 0.0)
         )
         
-        # Update relevance based on combined score
-        for doc in combined:
-            score = doc['combined_score']
-            if score > 0.6:
-                doc['relevance'] = 'high'
-            elif score > 0.3:
-                doc['relevance'] = 'medium'
-            else:
-                doc['relevance'] = 'low'
+        # Rank by combined score (stable on ties) - only the top_k survivors are labelled
+        rows = self._top_rows(combined, top_k)
+        fused = [docs[row] for row in rows.tolist()]
+        for doc, row in zip(fused, rows.tolist()):
+            doc.semantic_score = float(scores[row, 0]) if present[row, 0] else None
+            doc.bm25_score = float(scores[row, 1]) if present[row, 1] else None
         
-        return combined
+        # Update relevance based on combined score
+        self._label_sources(fused, present[rows])
+        self._label_relevance(fused, combined[rows])
+        return fused
     
     def _reciprocal_rank_fusion(
         self,
-        semantic_results: List[Dict],
-        keyword_results: List[Dict],
-        k: int = 60
-    ) -> List[Dict]:
+        semantic_results: List[RetrievedDoc],
+        keyword_results: List[RetrievedDoc],
+        k: int = 60,
+        subject: Optional[str] = None,
+        level: Optional[str] = None,
+        top_k: Optional[int] = None
+    ) -> List[RetrievedDoc]:
         """
         Combine results using Reciprocal Rank Fusion (RRF)
         
@@ -603,84 +1698,49 @@ class EducationalRAG:
             semantic_results: Results from semantic search
             keyword_results: Results from BM25 search
             k: RRF parameter (typically 60)
+            subject: Keep only results for this subject (optional)
+            level: Keep only results at this level (optional)
+            top_k: Number of results to keep (optional, default all)
             
         Returns:
             Combined and sorted results
         """
-        rrf_scores = defaultdict(float)
-        doc_data = {}
-        
-        # Process semantic results
-        for rank, result in enumerate(semantic_results, 1):
-            content = result['content']
-            rrf_scores[content] += 1 / (k + rank)
-            if content not in doc_data:
-                doc_data[content] = {
-                    **result,
-                    'semantic_rank': rank,
-                    'sources': ['semantic']
-                }
-            else:
-                doc_data[content]['semantic_rank'] = rank
-                doc_data[content]['sources'].append('semantic')
-        
-        # Process keyword results
-        for rank, result in enumerate(keyword_results, 1):
-            content = result['content']
-            rrf_scores[content] += 1 / (k + rank)
-            if content not in doc_data:
-                doc_data[content] = {
-                    **result,
-                    'bm25_rank': rank,
-                    'sources': ['bm25']
-                }
-            else:
-                doc_data[content]['bm25_rank'] = rank
-                if 'bm25' not in doc_data[content]['sources']:
-                    doc_data[content]['sources'].append('bm25')
-        
-        # Build final results
-        combined = []
-        for content, rrf_score in rrf_scores.items():
-            doc = doc_data[content].copy()
-            doc['rrf_score'] = rrf_score
-            # Normalize RRF score to 0-1 range for consistency
-            doc['combined_score'] = min(rrf_score * k / 2, 1.0)  
-            
-            # Update relevance
-            if doc['combined_score'] > 0.6:
-                doc['relevance'] = 'high'
-            elif doc['combined_score'] > 0.3:
-                doc['relevance'] = 'medium'
-            else:
-                doc['relevance'] = 'low'
-            
-            combined.append(doc)
+        docs, ranks, _ = self._merge_candidates(
+            semantic_results, keyword_results, subject, level
+        )
+        present = ranks > 0
+        reciprocal = 1 / (k + ranks)
+        rrf = (
+            np.where(present[:, 0], reciprocal[:, 0], 0.0)
+            + np.where(present[:, 1], reciprocal[:, 1], 0.0)
+        )
         
-        # Sort by RRF score
-        combined.sort(key=lambda x: x['rrf_score'], reverse=True)
+        # Rank by RRF score (stable on ties) - only the top_k survivors get their scores set
+        rows = self._top_rows(rrf, top_k)
+        fused = [docs[row] for row in rows.tolist()]
+        for doc, row in zip(fused, rows.tolist()):
+            doc.rrf_score = float(rrf[row])
+            doc.semantic_rank = int(ranks[row, 0]) or None
+            doc.bm25_rank = int(ranks[row, 1]) or None
         
-        return combined
+        # Normalize RRF score to 0-1 range for consistency
+        self._label_sources(fused, present[rows])
+        self._label_relevance(fused, np.minimum(rrf[rows] * k / 2, 1.0))
+        return fused
     
-    def _filter_by_criteria(
-        self,
-        results: List[Dict],
+    @staticmethod
+    def _matches_criteria(
+        result: RetrievedDoc,
         subject: Optional[str],
         level: Optional[str]
-    ) -> List[Dict]:
-        """Filter results by subject and level"""
-        filtered = []
-        for result in results:
-            metadata = result.get('metadata', {})
-            
-            if subject and metadata.get('subject') != subject:
-                continue
-            if level and metadata.get('level') != level:
-                continue
-            
-            filtered.append(result)
-        
-        return filtered
+    ) -> bool:
+        """Whether a result's metadata matches the subject and level filters"""
+        metadata = result.metadata or {}
+        if subject and metadata.get('subject') != subject:
+            return False
+        if level and metadata.get('level') != level:
+            return False
+        return True
     
     async def get_search_statistics(self) -> Dict[str, Any]:
         """
@@ -692,9 +1752,9 @@ class EducationalRAG:
         stats = {
             'chromadb_initialized': self.collection is not None,
             'bm25_initialized': self.bm25_index is not None,
-            'bm25_available': hasattr(self, 'BM25Okapi'),  # Whether BM25 library is available
-            'hybrid_search_available': hasattr(self, 'BM25Okapi'),  # Based on library availability, not index
-            'total_documents': len(self.bm25_documents) if self.bm25_documents else 0,
+            'bm25_available': self.bm25_available,  # Whether BM25 library is available
+            'hybrid_search_available': self.bm25_available,  # Based on library availability, not index
+            'total_documents': len(self.bm25_documents),
             'embedder_available': self.embedder is not None,
             'collection_name': self.collection_name,
             'persist_directory': self.persist_directory
@@ -703,7 +1763,6 @@ class EducationalRAG:
         if self.collection:
             try:
                 # Get ChromaDB collection stats
-                import asyncio
                 count = await asyncio.to_thread(self.collection.count)
                 stats['chromadb_document_count'] = count
             except:
@@ -718,13 +1777,34 @@ class EducationalReranker:
     Uses cross-encoder for more accurate relevance scoring
     """
     
-    def __init__(self):
-        """Initialize the reranker"""
+    def __init__(
+        self,
+        use_fp16: Optional[bool] = None,
+        batch_size: int = 32,
+        use_onnx: Optional[bool] = None
+    ):
+        """
+        Initialize the reranker
+        
+        Args:
+            use_fp16: Run the cross-encoder in FP16 on CUDA devices
+                      (defaults to the RERANKER_FP16 env var, on by default)
+            batch_size: Number of query-document pairs scored per forward pass
+            use_onnx: Run the cross-encoder as an int8 ONNX model on CPU
+                      (defaults to the RERANKER_ONNX env var)
+        """
         self.cross_encoder = None
         self.initialized = False
+        self.fp16 = False
+        self.onnx = False
+        self.batch_size = batch_size
+        
+        if use_fp16 is None:
+            use_fp16 = os.getenv('RERANKER_FP16', 'true').lower() == 'true'
+        if use_onnx is None:
+            use_onnx = os.getenv('RERANKER_ONNX', 'false').lower() == 'true'
         
         try:
-            from sentence_transformers import CrossEncoder
             try:
                 from utils.device_config import get_optimal_device
                 device = get_optimal_device()
@@ -732,12 +1812,18 @@ class EducationalReranker:
                 logger.warning("device_config not available, using cpu")
                 device = 'cpu'
             
-            self.cross_encoder = CrossEncoder(
+            # FP16 only pays off on GPU tensor cores; quantized ONNX only on CPU
+            self.fp16 = use_fp16 and device == 'cuda'
+            self.onnx = use_onnx and device == 'cpu'
+            self.cross_encoder = _get_cross_encoder(
                 'cross-encoder/ms-marco-MiniLM-L-6-v2',
-                device=device
+                device,
+                self.fp16,
+                self.onnx
             )
             self.initialized = True
-            logger.info(f"Educational reranker initialized on {device.upper()}")
+            precision = "ONNX int8" if self.onnx else "FP16" if self.fp16 else "FP32"
+            logger.info(f"Educational reranker initialized on {device.upper()} ({precision})")
         except ImportError:
             logger.warning("sentence-transformers not available - reranking limited")
         except Exception as e:
@@ -754,15 +1840,12 @@ class EducationalReranker:
         Returns:
             List of normalized scores between 0 and 1
         """
-        import math
-        
-        # Convert to list if numpy array
-        if hasattr(scores, 'tolist'):
-            scores = scores.tolist()
+        # Clip logits so extreme values can't overflow exp
+        logits = np.clip(np.asarray(scores, dtype=np.float64), -40.0, 40.0)
         
         # Apply sigmoid normalization: 1 / (1 + e^(-x))
-        normalized = [1 / (1 + math.exp(-score)) for score in scores]
-        return normalized
+        normalized = 1.0 / (1.0 + np.exp(-logits))
+        return normalized.tolist()
     
     def rerank_for_learning(
         self,
@@ -798,7 +1881,18 @@ class EducationalReranker:
             ]
             
             # Score with cross-encoder (returns raw logits)
-            scores = self.cross_encoder.predict(pairs)
+            # Sort by document length so each batch pads to a similar length
+            order = np.argsort([len(doc) for _, doc in pairs], kind='stable')
+            sorted_scores = self.cross_encoder.predict(
+                [pairs[i] for i in order],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            
+            # Scatter scores back to candidate order
+            scores = np.empty(len(pairs), dtype=np.float64)
+            scores[order] = sorted_scores
+            scores = scores.tolist()
             
             # Log raw score range for debugging
             logger.debug(f"Raw score range: [{min(scores):.3f}, {max(scores):.3f}]")
@@ -819,16 +1913,12 @@ class EducationalReranker:
             if student_level:
                 candidates = self._filter_by_level(candidates, student_level)
             
-            # Sort by rerank score
-            reranked = sorted(
-                candidates,
-                key=lambda x: x.get('rerank_score', 0),
-                reverse=True
-            )
-            
-            # Return top_k if specified
+            # Sort by rerank score - with top_k only the survivors are ordered
+            rank_key = lambda x: x.get('rerank_score', 0)
             if top_k:
-                reranked = reranked[:top_k]
+                reranked = heapq.nlargest(top_k, candidates, key=rank_key)
+            else:
+                reranked = sorted(candidates, key=rank_key, reverse=True)
             
             logger.info(f"Re-ranking complete - returned {len(reranked)} results")
             return reranked
@@ -868,7 +1958,8 @@ class EducationalReranker:
 
 def create_rag_system(
     persist_directory: str = "./chroma_db",
-    collection_name: str = "educational_content"
+    collection_name: str = "educational_content",
+    hnsw_params: Optional[Dict[str, Any]] = None
 ) -> tuple:
     """
     Factory function to create RAG system and reranker
@@ -876,13 +1967,17 @@ def create_rag_system(
     Args:
         persist_directory: Directory for vector database
         collection_name: Name of the collection
+        hnsw_params: ChromaDB HNSW metadata for a new collection
+                     (merged over DEFAULT_HNSW_PARAMS; changing
+                     "hnsw:space" requires a re-index)
         
     Returns:
         Tuple of (EducationalRAG, EducationalReranker)
     """
     rag = EducationalRAG(
         persist_directory=persist_directory,
-        collection_name=collection_name
+        collection_name=collection_name,
+        collection_metadata=hnsw_params
     )
     reranker = EducationalReranker()
     
@@ -891,8 +1986,6 @@ def create_rag_system(
 
 # Example usage and testing
 if __name__ == "__main__":
-    import asyncio
-    
     async def test_rag():
         """Test the RAG system"""
         print("Testing Educational RAG System with Hybrid Search...")
@@ -903,7 +1996,7 @@ if __name__ == "__main__":
         
         if not rag.initialized:
             print("RAG system not initialized - install dependencies")
-            print("Run: pip install chromadb sentence-transformers rank-bm25")
+            print("Run: pip install chromadb sentence-transformers scipy")
             return
         
         # Check search capabilities
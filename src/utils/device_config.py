@@ -3,19 +3,38 @@ Device configuration for ML models
 Automatically detects and configures GPU usage
 """
 
+import os
 import logging
-import torch
+import functools
+from types import MappingProxyType
+from typing import Any, Mapping
 
 logger = logging.getLogger(__name__)
 
+# torch is imported on first use: importing it costs about a second, and
+# consumers that never touch a model (e.g. logging-only tools) shouldn't pay it
+_torch = None
 
+
+def _get_torch():
+    """Import torch once, on first use"""
+    global _torch
+    if _torch is None:
+        import torch
+        _torch = torch
+    return _torch
+
+
+@functools.lru_cache(maxsize=None)
 def get_optimal_device() -> str:
     """
     Detect and return the best available device
+    Detection runs once per process; later calls return the cached result
     
     Returns:
         Device string: 'cuda', or 'cpu'
     """
+    torch = _get_torch()
     
     # Check for GPU
     if torch.cuda.is_available():
@@ -23,6 +42,7 @@ def get_optimal_device() -> str:
         gpu_name = torch.cuda.get_device_name(0)
         logger.info(f"GPU detected: {gpu_name}")
         logger.info(f"CUDA version: {torch.version.cuda}")
+        _configure_cuda()
         return device
     
     
@@ -30,26 +50,80 @@ def get_optimal_device() -> str:
     logger.warning("No GPU detected - using CPU (this will be slower)")
     logger.info("To enable GPU:")
     logger.info("  - NVIDIA: Install CUDA toolkit and PyTorch with CUDA")
+    _configure_cpu_threads()
     return 'cpu'
-    
 
 
+def _configure_cuda():
+    """
+    Enable cuDNN autotuning, and TF32 matmuls if TORCH_ALLOW_TF32=true
+    TF32 is opt-in: it shifts embeddings slightly against vectors already stored
+    """
+    torch = _get_torch()
+    torch.backends.cudnn.benchmark = True
+    if os.getenv('TORCH_ALLOW_TF32', 'false').lower() == 'true':
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        logger.info("TF32 matmuls enabled")
 
-def get_device_info() -> dict:
-    """Get detailed device information"""
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    
-    info = {
-        'device': device,
-        'cpu_count': torch.get_num_threads(),
-        'gpu_available': torch.cuda.is_available()
-    }
+
+def _configure_cpu_threads():
+    """
+    Apply TORCH_NUM_THREADS to PyTorch's intra-op pool, if set
+    Otherwise torch keeps its own default (one thread per physical core)
+    """
+    num_threads = _thread_override()
+    if num_threads:
+        _get_torch().set_num_threads(num_threads)
+        logger.info(f"CPU inference threads: {num_threads}")
+
+
+def _thread_override() -> int:
+    """
+    Thread count from TORCH_NUM_THREADS, or 0 if unset or invalid
+    A bad value is logged and ignored rather than failing model setup
+    """
+    value = os.getenv('TORCH_NUM_THREADS', '').strip()
+    if not value:
+        return 0
+    try:
+        num_threads = int(value)
+    except ValueError:
+        num_threads = 0
+    if num_threads <= 0:
+        logger.warning(f"Ignoring invalid TORCH_NUM_THREADS={value!r} - expected a positive integer")
+        return 0
+    return num_threads
+
+
+@functools.lru_cache(maxsize=None)
+def _gpu_info() -> Mapping[str, Any]:
+    """Probe CUDA once per process; the hardware does not change while running"""
+    torch = _get_torch()
+    info = {'gpu_available': torch.cuda.is_available()}
     
     if info['gpu_available']:
         info['gpu_count'] = torch.cuda.device_count()
         info['gpu_name'] = torch.cuda.get_device_name(0)
         info['gpu_memory'] = torch.cuda.get_device_properties(0).total_memory / 1e9  # GB
     
+    return MappingProxyType(info)
+
+
+def get_device_info() -> dict:
+    """
+    Get detailed device information
+    GPU details are probed once and cached; the thread count is read live
+    """
+    torch = _get_torch()
+    gpu_info = _gpu_info()
+    
+    info = {
+        'device': 'cuda' if gpu_info['gpu_available'] else 'cpu',
+        'cpu_count': torch.get_num_threads(),
+        **gpu_info
+    }
+    
     return info
     
 
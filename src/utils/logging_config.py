@@ -4,12 +4,28 @@ Provides comprehensive logging for debugging and monitoring
 """
 
 import logging
+import logging.handlers
+import atexit
+import queue
 import sys
 import os
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Tuple
+
+
+# Log files rotate at this size, keeping this many old files
+LOG_MAX_BYTES = 50_000_000
+LOG_BACKUP_COUNT = 5
+
+# Loggers handed out by get_logger, by name
+_logger_cache: Dict[str, logging.Logger] = {}
+
+# Queued writers by logger name: (logger, its QueueHandler, listener writing to disk)
+_queue_listeners: Dict[
+    str, Tuple[logging.Logger, logging.Handler, logging.handlers.QueueListener]
+] = {}
 
 
 class SensitiveDataFilter(logging.Filter):
@@ -39,6 +55,18 @@ class SensitiveDataFilter(logging.Filter):
             value = os.getenv(var)
             if value and value not in ['', 'your_key_here', 'None']:
                 self.secrets.append(value)
+        
+        # One alternation scans each message once for all secrets;
+        # longest first so a secret containing another is redacted whole
+        self._pattern = re.compile(
+            '|'.join(re.escape(secret) for secret in sorted(set(self.secrets), key=len, reverse=True))
+        ) if self.secrets else None
+    
+    def _redact(self, value):
+        """Redact secrets from a string value; other values pass through"""
+        if isinstance(value, str):
+            return self._pattern.sub('***REDACTED***', value)
+        return value
     
     def filter(self, record: logging.LogRecord) -> bool:
         """
@@ -50,40 +78,88 @@ class SensitiveDataFilter(logging.Filter):
         Returns:
             True to allow the record through, False to block it
         """
-        # If full logging is enabled, don't redact
-        if self.enable_full_logging:
+        # If full logging is enabled or there is nothing to redact, pass through
+        if self.enable_full_logging or self._pattern is None:
             return True
         
         # Redact message
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
-            for secret in self.secrets:
-                if secret in record.msg:
-                    record.msg = record.msg.replace(secret, '***REDACTED***')
+        record.msg = self._redact(record.msg)
         
         # Redact args (used in formatted messages)
-        if hasattr(record, 'args') and record.args:
-            if isinstance(record.args, dict):
-                redacted_args = {}
-                for key, value in record.args.items():
-                    if isinstance(value, str):
-                        for secret in self.secrets:
-                            if secret in value:
-                                value = value.replace(secret, '***REDACTED***')
-                    redacted_args[key] = value
-                record.args = redacted_args
-            elif isinstance(record.args, (list, tuple)):
-                redacted_args = []
-                for arg in record.args:
-                    if isinstance(arg, str):
-                        for secret in self.secrets:
-                            if secret in arg:
-                                arg = arg.replace(secret, '***REDACTED***')
-                    redacted_args.append(arg)
-                record.args = tuple(redacted_args) if isinstance(record.args, tuple) else redacted_args
+        args = record.args
+        if args:
+            if isinstance(args, dict):
+                record.args = {key: self._redact(value) for key, value in args.items()}
+            elif isinstance(args, tuple):
+                record.args = tuple(self._redact(arg) for arg in args)
+            elif isinstance(args, list):
+                record.args = [self._redact(arg) for arg in args]
         
         return True
 
 
+def _file_handler(log_file: Path) -> logging.Handler:
+    """
+    Size-rotated log file, opened lazily on the first record it writes
+    
+    Args:
+        log_file: Path of the log file
+        
+    Returns:
+        Configured file handler
+    """
+    return logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+        delay=True
+    )
+
+
+def _queued(logger: logging.Logger, handler: logging.Handler):
+    """
+    Attach a handler to a logger behind a queue, replacing any earlier queued writer
+    The calling thread still merges the message args (and formats any traceback)
+    before enqueueing; the listener thread does the final formatting and disk I/O
+    
+    Args:
+        logger: Logger to attach to
+        handler: Handler doing the actual (blocking) output
+    """
+    _stop_queue(logger.name)
+    
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.setLevel(handler.level)
+    
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    logger.addHandler(queue_handler)
+    _queue_listeners[logger.name] = (logger, queue_handler, listener)
+
+
+def _stop_queue(name: str):
+    """Detach a logger's queued writer, flush what is queued and close its file"""
+    entry = _queue_listeners.pop(name, None)
+    if entry is None:
+        return
+    logger, queue_handler, listener = entry
+    logger.removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def stop_logging():
+    """Flush queued records and stop the background log writers"""
+    for name in list(_queue_listeners):
+        _stop_queue(name)
+
+
+atexit.register(stop_logging)
+
+
 def setup_logging(
     level: str = "INFO",
     log_dir: str = "./logs",
@@ -128,7 +204,8 @@ def setup_logging(
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, level.upper()))
     
-    # Remove existing handlers
+    # Remove existing handlers, flushing any queued writer from a previous setup
+    _stop_queue(root_logger.name)
     root_logger.handlers.clear()
     
     # Console handler
@@ -140,24 +217,25 @@ def setup_logging(
     
     # File handler (detailed)
     if enable_file_logging:
-        file_handler = logging.FileHandler(log_file)
+        file_handler = _file_handler(log_file)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_formatter)
-        root_logger.addHandler(file_handler)
+        _queued(root_logger, file_handler)
     
     # LLM request logger (separate file)
     if log_llm_requests:
         llm_logger = logging.getLogger('llm_requests')
         llm_file = log_path / f"llm_requests_{timestamp}.log"
-        llm_handler = logging.FileHandler(llm_file)
+        llm_handler = _file_handler(llm_file)
         llm_handler.setFormatter(detailed_formatter)
-        llm_logger.addHandler(llm_handler)
         llm_logger.setLevel(logging.DEBUG)
         llm_logger.propagate = False  # Don't propagate to root
         
         # Add sensitive data filter (redacts by default unless full logging enabled)
+        # On the handler, so only records that pass its level check get scanned
         sensitive_filter = SensitiveDataFilter(enable_full_logging=enable_full_llm_logging)
-        llm_logger.addFilter(sensitive_filter)
+        llm_handler.addFilter(sensitive_filter)
+        _queued(llm_logger, llm_handler)
         
         if enable_full_llm_logging:
             logging.warning("Full unredacted LLM logging is ENABLED - sensitive data will be logged!")
@@ -168,9 +246,9 @@ def setup_logging(
     if log_api_requests:
         api_logger = logging.getLogger('api_requests')
         api_file = log_path / f"api_requests_{timestamp}.log"
-        api_handler = logging.FileHandler(api_file)
+        api_handler = _file_handler(api_file)
         api_handler.setFormatter(detailed_formatter)
-        api_logger.addHandler(api_handler)
+        _queued(api_logger, api_handler)
         api_logger.setLevel(logging.DEBUG)
         api_logger.propagate = False  # Don't propagate to root
     
@@ -188,7 +266,12 @@ def get_logger(name: str) -> logging.Logger:
     Returns:
         Logger instance
     """
-    return logging.getLogger(name)
+    # Loggers live for the whole process, so a plain dict hit avoids
+    # logging.getLogger's manager lock on repeated lookups
+    logger = _logger_cache.get(name)
+    if logger is None:
+        logger = _logger_cache.setdefault(name, logging.getLogger(name))
+    return logger
 
 
 if __name__ == "__main__":
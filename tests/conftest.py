@@ -4,13 +4,17 @@ Shared test fixtures and configuration for Multi-Agent Tutor test suite
 
 import pytest
 import sys
+import functools
+import importlib.util
 import tempfile
 import shutil
 from pathlib import Path
 from unittest.mock import Mock, AsyncMock
 import asyncio
 from typing import Generator, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 import redis
+import requests
 import os
 
 # Setup project paths properly
@@ -20,41 +24,47 @@ sys.path.insert(0, str(PROJECT_ROOT / 'src'))
 # Import after path setup
 from agents.state_schema import create_initial_state
 
+# Standalone script (python tests/test_diagnostics.py) with no tests of its
+# own; it only matches the test_*.py glob, so keep pytest from importing it
+collect_ignore = ["test_diagnostics.py"]
+
 # ============================================================================
 # Service Availability Checks
 # ============================================================================
+# Each probe runs at most once per pytest process; services don't come and
+# go mid-run, and every marked test would otherwise re-probe
+
+# Shared connections for the probes, closed in pytest_sessionfinish
+_PROBE_SESSION = requests.Session()
+_REDIS_POOL = redis.ConnectionPool.from_url('redis://localhost:6379/0')
 
+@functools.lru_cache(maxsize=1)
 def check_redis() -> bool:
     """Check if Redis is available"""
     try:
-        r = redis.from_url('redis://localhost:6379/0')
-        r.ping()
+        redis.Redis(connection_pool=_REDIS_POOL).ping()
         return True
     except (redis.ConnectionError, Exception):
         return False
 
 
+@functools.lru_cache(maxsize=1)
 def check_ollama() -> bool:
-    """Check if Ollama service is available"""
+    """Check if Ollama service is available (HEAD on the root - headers only)"""
     try:
-        import requests
-        response = requests.get('http://localhost:11434/api/tags', timeout=1)
+        response = _PROBE_SESSION.head('http://localhost:11434/', timeout=0.3)
         return response.status_code == 200
-    except:
+    except requests.RequestException:
         return False
 
 
+@functools.lru_cache(maxsize=1)
 def check_chromadb() -> bool:
-    """Check if ChromaDB is available"""
-    try:
-        import chromadb
-        client = chromadb.Client()
-        client.list_collections()
-        return True
-    except:
-        return False
+    """Check if ChromaDB is installed (embedded, so no server to probe; not imported here)"""
+    return importlib.util.find_spec("chromadb") is not None
 
 
+@functools.lru_cache(maxsize=1)
 def check_langsmith() -> bool:
     """Check if LangSmith API is configured"""
     return bool(os.getenv('LANGCHAIN_API_KEY'))
@@ -95,6 +105,18 @@ def event_loop():
     yield loop
     loop.close()
 
+
+@pytest.fixture(scope="session", autouse=True)
+def cache_key_namespace() -> Generator[str, None, None]:
+    """Namespace the global cache manager's keys per xdist worker"""
+    from optimization.educational_caching import cache_manager
+
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    original = cache_manager.key_prefix
+    cache_manager.key_prefix = f"test:{worker}:"
+    yield cache_manager.key_prefix
+    cache_manager.key_prefix = original
+
 # ============================================================================
 # Mock Fixtures
 # ============================================================================
@@ -152,20 +174,60 @@ def mock_redis_client():
     client.ttl.return_value = -2
     client.ping.return_value = True
     client.keys.return_value = []
+    client.scan.return_value = (0, [])
     return client
 
+
+_STUB_SEARCH_RESULTS = [
+    {"title": "Test resource", "href": "https://example.com", "body": "Test content"}
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_network(request, monkeypatch):
+    """
+    Stub the two outbound chokepoints - LLM generation and DuckDuckGo search -
+    so no test reaches the network; tests marked requires_llm keep the real calls
+    """
+    if request.node.get_closest_marker("requires_llm"):
+        return
+    
+    from ddgs import DDGS
+    from llm.educational_clients import EducationalLLMManager
+    
+    monkeypatch.setattr(DDGS, "text", lambda self, query, **kwargs: list(_STUB_SEARCH_RESULTS))
+    monkeypatch.setattr(
+        EducationalLLMManager, "generate_content",
+        AsyncMock(return_value="This is a test lesson explanation")
+    )
+
 # ============================================================================
 # Database Fixtures
 # ============================================================================
 
-@pytest.fixture
-def test_database():
-    """In-memory SQLite database for testing"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
+@pytest.fixture(scope="session")
+def database_engine():
+    """
+    In-memory SQLite engine with the schema created once per session
+    StaticPool keeps the single in-memory connection (and its tables) alive
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.pool import StaticPool
+    
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+    
+    # pysqlite's own transaction handling breaks SAVEPOINTs - let SQLAlchemy emit BEGIN
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
     
-    # Create in-memory database
-    engine = create_engine("sqlite:///:memory:")
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
     
     # Import Base and create tables
     try:
@@ -175,13 +237,31 @@ def test_database():
         # If models not available, skip database setup
         pass
     
-    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-    session = SessionLocal()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def test_database(database_engine):
+    """
+    Database session isolated in a transaction that is rolled back after the test
+    commit() inside the test only releases a SAVEPOINT
+    """
+    from sqlalchemy.orm import Session
+    
+    connection = database_engine.connect()
+    transaction = connection.begin()
+    session = Session(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        autoflush=False
+    )
     
     yield session
     
     session.close()
-    engine.dispose()
+    transaction.rollback()
+    connection.close()
 
 
 @pytest.fixture
@@ -205,6 +285,23 @@ def mock_chromadb_collection():
 # Agent and System Fixtures
 # ============================================================================
 
+@pytest.fixture(scope="session")
+def shared_tutoring_system():
+    """
+    Tutoring system built (and its graph compiled) once per session
+    Phase 2 features are off so no LLM, agents or RAG models load; tests
+    must not mutate it beyond patch.object-style temporary overrides
+    """
+    from agents.tutoring_graph import AdvancedTutoringSystem
+    
+    return AdvancedTutoringSystem(
+        use_local_model=False,
+        enable_llm=False,
+        enable_specialized_agents=False,
+        enable_advanced_rag=False
+    )
+
+
 @pytest.fixture
 def sample_student_profile():
     """Sample student profile for testing"""
@@ -243,15 +340,22 @@ def mock_websocket():
     return ws
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def api_client():
-    """Test client for FastAPI application"""
+    """
+    Test client for FastAPI application, shared by the whole session
+    Entered as a context manager so lifespan startup/shutdown run once
+    """
     try:
         from fastapi.testclient import TestClient
         from api.websocket_routes import app
-        return TestClient(app)
     except ImportError:
-        return None
+        yield None
+        return
+    
+    with TestClient(app) as client:
+        yield client
+        app.dependency_overrides.clear()
 
 # ============================================================================
 # Test Data Fixtures
@@ -310,11 +414,37 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "asyncio: Async tests")
 
 
+# Service probe needed by each requires_* marker
+SERVICE_PROBES = {
+    'requires_redis': check_redis,
+    'requires_llm': check_ollama,
+    'requires_chromadb': check_chromadb,
+    'requires_langsmith': check_langsmith,
+}
+
+
 def pytest_collection_modifyitems(config, items):
-    """Automatically add asyncio marker to async tests"""
+    """Automatically add asyncio marker to async tests, then warm the needed probes"""
+    needed = set()
     for item in items:
         if asyncio.iscoroutinefunction(item.function):
             item.add_marker(pytest.mark.asyncio)
+        needed.update(
+            SERVICE_PROBES[marker.name] for marker in item.iter_markers()
+            if marker.name in SERVICE_PROBES
+        )
+    
+    # Probe only the services the selected tests need, all at once, so the
+    # first marked test finds the answer already cached
+    if needed:
+        with ThreadPoolExecutor(max_workers=len(needed)) as pool:
+            list(pool.map(lambda probe: probe(), needed))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Close the shared probe connections"""
+    _PROBE_SESSION.close()
+    _REDIS_POOL.disconnect()
 
 
 def pytest_runtest_setup(item):
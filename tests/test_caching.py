@@ -2,12 +2,11 @@
 Comprehensive test suite for all caching functionality
 Consolidates tests from: test_cache_comprehensive.py, test_cache_integration.py, test_phase3_caching.py
 """
-import pickle
 import pytest
 import json
-import pickle
+import orjson
+import numpy as np
 import hashlib
-import asyncio
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, AsyncMock
 from typing import Any, Dict
@@ -35,8 +34,8 @@ class TestEducationalCacheManager:
     def test_cache_initialization(self):
         """Test cache manager initialization"""
         assert self.cache_manager is not None
-        assert hasattr(self.cache_manager, 'redis_client')
-        assert hasattr(self.cache_manager, 'default_ttl')
+        assert self.cache_manager.redis_client is not None
+        assert self.cache_manager.default_ttl == 3600
     
     @pytest.mark.unit
     def test_generate_cache_key(self):
@@ -44,7 +43,7 @@ class TestEducationalCacheManager:
         # Test with string
         key1 = generate_cache_key("test", "value")
         assert isinstance(key1, str)
-        assert len(key1) > 0
+        assert len(key1) == 16
         
         # Test with dict
         key2 = generate_cache_key("test", {"param": "value"})
@@ -69,16 +68,32 @@ class TestEducationalCacheManager:
         # Set value
         self.cache_manager.set_lesson(topic, level, style, value, ttl=60)
         
-        # Verify set was called
+        # Verify set was called with the JSON payload
         self.cache_manager.redis_client.setex.assert_called_once()
+        assert self.cache_manager.redis_client.setex.call_args[0][2] == orjson.dumps(value)
         
         # Mock get response
-        self.cache_manager.redis_client.get.return_value = pickle.dumps(value)
+        self.cache_manager.redis_client.get.return_value = orjson.dumps(value)
         
         # Get value
         retrieved = self.cache_manager.get_lesson(topic, level, style)
         assert retrieved == value
-    
+
+    @pytest.mark.unit
+    def test_set_non_json_types(self):
+        """Test sets, datetimes and NumPy scores are stored as JSON-safe values"""
+        started = datetime(2025, 1, 1, 12, 0)
+        session = {"tags": {"algebra"}, "started": started, "score": np.float32(0.5)}
+
+        self.cache_manager.cache_student_session("s1", session)
+
+        stored = self.cache_manager.redis_client.setex.call_args[0][2]
+        assert orjson.loads(stored) == {
+            "tags": ["algebra"],
+            "started": "2025-01-01T12:00:00+00:00",
+            "score": 0.5
+        }
+
     @pytest.mark.unit
     def test_get_nonexistent_key(self):
         """Test getting non-existent key returns None"""
@@ -90,16 +105,23 @@ class TestEducationalCacheManager:
     @pytest.mark.unit
     def test_delete_key(self):
         """Test deleting cache key"""
-        # Mock keys to return some results
-        self.cache_manager.redis_client.keys.return_value = [b"tutor:lesson:key1", b"tutor:lesson:key2"]
+        # Mock scan to return the matching keys over two cursor pages
+        client = self.cache_manager.redis_client
+        prefix = self.cache_manager.key_prefix.encode()
+        client.scan.side_effect = [(7, [prefix + b"lesson:key1"]), (0, [prefix + b"lesson:key2"])]
         
         # Delete keys by pattern
         self.cache_manager.clear_cache("lesson")
         
-        # Verify keys() was called to find matching keys
-        self.cache_manager.redis_client.keys.assert_called_once()
-        # Verify delete was called with the found keys
-        self.cache_manager.redis_client.delete.assert_called_once()
+        # Verify SCAN walked the cursor instead of a blocking KEYS
+        assert client.scan.call_count == 2
+        assert client.scan.call_args_list[0].kwargs["match"] == f"{self.cache_manager.key_prefix}lesson:*"
+        client.keys.assert_not_called()
+        # Verify the found keys were unlinked on one pipeline round trip
+        pipe = client.pipeline.return_value
+        assert pipe.unlink.call_count == 2
+        pipe.execute.assert_called_once()
+        client.delete.assert_not_called()
     
 
 
@@ -112,7 +134,8 @@ class TestCacheDecorators:
         self.mock_cache = mock_cache_manager
         
     @pytest.mark.unit
-    def test_cache_lesson_decorator(self):
+    @pytest.mark.asyncio
+    async def test_cache_lesson_decorator(self):
         """Test @cache_lesson decorator"""
         with patch('optimization.cache_decorators.cache_manager', self.mock_cache):
             @cache_lesson(ttl=60)
@@ -121,14 +144,14 @@ class TestCacheDecorators:
             
             # First call - cache miss
             self.mock_cache.get_lesson.return_value = None
-            result = asyncio.run(create_lesson(None, "Python", "beginner", "visual"))
+            result = await create_lesson(None, "Python", "beginner", "visual")
             
             assert result["topic"] == "Python"
             self.mock_cache.set_lesson.assert_called_once()
             
             # Second call - cache hit
             self.mock_cache.get_lesson.return_value = {"topic": "Python", "content": "Cached"}
-            result = asyncio.run(create_lesson(None, "Python", "beginner", "visual"))
+            result = await create_lesson(None, "Python", "beginner", "visual")
             
             assert result["content"] == "Cached"
 
@@ -138,13 +161,13 @@ class TestCacheIntegration:
     
     @pytest.mark.integration
     @pytest.mark.requires_redis
-    def test_real_redis_connection(self):
+    def test_real_redis_connection(self, cache_key_namespace):
         """Test actual Redis connection and operations"""
         try:
             manager = EducationalCacheManager()
             
-            # Test basic operations
-            key = "integration_test_key"
+            # Test basic operations; the key is per worker so parallel runs don't race
+            key = f"{cache_key_namespace}integration_test_key"
             value = {"test": "data", "timestamp": datetime.now().isoformat()}
             
             # Set value
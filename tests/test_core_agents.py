@@ -90,43 +90,32 @@ class TestAdvancedTutoringSystem:
     """Test suite for the AdvancedTutoringSystem"""
     
     @pytest.fixture(autouse=True)
-    def setup(self, mock_llm):
-        """Setup test instance with mocked dependencies"""
-        with patch('llm.educational_clients.EducationalLLMManager') as mock_llm_class:
-            mock_llm_class.return_value = mock_llm
-            self.system = AdvancedTutoringSystem(use_local_model=False)
-            self.student = StudentProfile(
-                name="Test Student",
-                level="intermediate"
-            )
+    def setup(self, shared_tutoring_system):
+        """Setup test instance from the session-wide system"""
+        self.system = shared_tutoring_system
+        self.student = StudentProfile(
+            name="Test Student",
+            level="intermediate"
+        )
     
     @pytest.mark.unit
     def test_system_initialization(self):
         """Test tutoring system initialization"""
         assert self.system is not None
-        assert hasattr(self.system, 'use_local_model')
+        assert self.system.use_local_model is False
 
 
 class TestSubjectExperts:
     """Test suite for subject expert agents"""
     
     @pytest.mark.unit
-    def test_math_tutor_agent(self):
-        """Test MathTutorAgent initialization"""
-        agent = MathTutorAgent()
-        assert agent is not None
-        assert hasattr(agent, 'llm')
-    
-    @pytest.mark.unit
-    def test_science_tutor_agent(self):
-        """Test ScienceTutorAgent initialization"""
-        agent = ScienceTutorAgent()
-        assert agent is not None
-        assert hasattr(agent, 'llm')
-    
-    @pytest.mark.unit
-    def test_programming_tutor_agent(self):
-        """Test ProgrammingTutorAgent initialization"""
-        agent = ProgrammingTutorAgent()
+    @pytest.mark.parametrize("agent_class", [
+        MathTutorAgent,
+        ScienceTutorAgent,
+        ProgrammingTutorAgent,
+    ])
+    def test_tutor_agent_initialization(self, agent_class):
+        """Test each subject expert agent initializes without an LLM by default"""
+        agent = agent_class()
         assert agent is not None
-        assert hasattr(agent, 'llm')
+        assert agent.llm is None
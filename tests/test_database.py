@@ -5,7 +5,7 @@ Test suite for database operations and models
 import pytest
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, selectinload, raiseload
 from unittest.mock import Mock, patch
 
 # Project imports - using actual model names from educational_models
@@ -129,25 +129,27 @@ class TestDatabaseIntegration:
         test_database.add(student)
         test_database.commit()
         
-        # Create multiple sessions
-        for i in range(3):
-            session = LearningSession(
+        # Create multiple sessions in one bulk insert
+        test_database.bulk_save_objects([
+            LearningSession(
                 session_id=f"session_{i}",
                 student_id=student.student_id,
                 topic=f"Topic {i}",
                 subject="Test"
             )
-            test_database.add(session)
-        
+            for i in range(3)
+        ])
         test_database.commit()
+        test_database.expire_all()
         
-        # Query student with sessions
-        student_with_sessions = test_database.query(Student).filter_by(
+        # Query student with sessions eagerly loaded; raiseload makes any
+        # other lazy load fail loudly instead of issuing a hidden query
+        student_with_sessions = test_database.query(Student).options(
+            selectinload(Student.sessions),
+            raiseload("*")
+        ).filter_by(
             email="related@example.com"
         ).first()
         
-        sessions = test_database.query(LearningSession).filter_by(
-            student_id=student_with_sessions.student_id
-        ).all()
-        
-        assert len(sessions) == 3
+        assert len(student_with_sessions.sessions) == 3
+        assert {s.topic for s in student_with_sessions.sessions} == {"Topic 0", "Topic 1", "Topic 2"}
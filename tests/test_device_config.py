@@ -0,0 +1,98 @@
+"""
+Test suite for device configuration
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from unittest.mock import Mock
+
+from utils import device_config
+from utils.device_config import _thread_override
+
+
+@pytest.mark.unit
+def test_import_does_not_load_torch():
+    """Importing the module must not import torch until a device is needed"""
+    src = Path(__file__).resolve().parent.parent / "src"
+    code = (
+        f"import sys; sys.path.insert(0, {str(src)!r}); "
+        "import utils.device_config; print('torch' in sys.modules)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
+
+
+class TestThreadOverride:
+    """Test parsing of TORCH_NUM_THREADS"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value, expected", [
+        ("4", 4),
+        (" 2 ", 2),
+        ("", 0),
+        ("four", 0),
+        ("-1", 0),
+    ])
+    def test_parses_env_value(self, monkeypatch, value, expected):
+        """Valid counts are used; unset, non-numeric and non-positive values fall back"""
+        monkeypatch.setenv("TORCH_NUM_THREADS", value)
+
+        assert _thread_override() == expected
+
+    @pytest.mark.unit
+    def test_unset(self, monkeypatch):
+        """No override when the variable is absent"""
+        monkeypatch.delenv("TORCH_NUM_THREADS", raising=False)
+
+        assert _thread_override() == 0
+
+
+class TestTorchSettings:
+    """Test which torch settings device detection changes"""
+
+    @pytest.fixture
+    def torch(self, monkeypatch):
+        fake = Mock()
+        fake.backends.cuda.matmul.allow_tf32 = False
+        fake.backends.cudnn.allow_tf32 = False
+        monkeypatch.setattr(device_config, "_get_torch", lambda: fake)
+        return fake
+
+    @pytest.mark.unit
+    def test_cpu_threads_left_to_torch(self, monkeypatch, torch):
+        """Without TORCH_NUM_THREADS torch keeps its default thread pools"""
+        monkeypatch.delenv("TORCH_NUM_THREADS", raising=False)
+
+        device_config._configure_cpu_threads()
+
+        torch.set_num_threads.assert_not_called()
+        torch.set_num_interop_threads.assert_not_called()
+
+    @pytest.mark.unit
+    def test_cpu_threads_override(self, monkeypatch, torch):
+        """TORCH_NUM_THREADS sets the intra-op pool only"""
+        monkeypatch.setenv("TORCH_NUM_THREADS", "3")
+
+        device_config._configure_cpu_threads()
+
+        torch.set_num_threads.assert_called_once_with(3)
+        torch.set_num_interop_threads.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value, expected", [(None, False), ("false", False), ("true", True)])
+    def test_tf32_opt_in(self, monkeypatch, torch, value, expected):
+        """TF32 matmuls are only enabled by TORCH_ALLOW_TF32=true"""
+        if value is None:
+            monkeypatch.delenv("TORCH_ALLOW_TF32", raising=False)
+        else:
+            monkeypatch.setenv("TORCH_ALLOW_TF32", value)
+
+        device_config._configure_cuda()
+
+        assert torch.backends.cuda.matmul.allow_tf32 is expected
+        assert torch.backends.cudnn.allow_tf32 is expected
+        assert torch.backends.cudnn.benchmark is True
@@ -4,12 +4,30 @@ Test diagnostic script - checks which tests can run
 """
 
 import sys
-import subprocess
+from importlib import import_module
+from importlib.util import find_spec
 from pathlib import Path
+from typing import Optional
 
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / 'src'))
 
+def _module_exists(module: str) -> bool:
+    """Check the module's file can be found, without executing it"""
+    try:
+        return find_spec(module) is not None
+    except ImportError:
+        # Parent package missing or failing to import
+        return False
+
+def _try_import(module: str) -> Optional[str]:
+    """Import a module, returning the error message if it fails"""
+    try:
+        import_module(module)
+    except Exception as e:
+        return str(e)
+    return None
+
 def check_imports():
     """Check which modules can be imported"""
     modules_to_check = [
@@ -35,13 +53,18 @@ def check_imports():
     available = []
     missing = []
     
+    # Locate every module first (no execution); only the ones present are imported,
+    # one after another - these packages import each other, so parallel imports race
+    present = [m for m in modules_to_check if _module_exists(m)]
+    errors = {module: _try_import(module) for module in present}
+    
     for module in modules_to_check:
-        try:
-            __import__(module)
+        error = errors[module] if module in errors else "module not found"
+        if error is None:
             print(f"  ✅ {module}")
             available.append(module)
-        except ImportError as e:
-            print(f"  ❌ {module}: {str(e)}")
+        else:
+            print(f"  ❌ {module}: {error}")
             missing.append(module)
     
     print(f"\n📊 Summary:")
@@ -54,14 +77,11 @@ def run_safe_tests():
     """Run only tests that should work"""
     print("\n🧪 Running safe tests...\n")
     
-    # Try to run unit tests only
-    result = subprocess.run(
-        ["pytest", "-v", "-m", "unit", "--tb=short"],
-        capture_output=False,
-        cwd=PROJECT_ROOT
-    )
+    # Try to run unit tests only, in this interpreter so the modules
+    # check_imports just loaded are reused rather than imported again
+    import pytest
     
-    return result.returncode
+    return int(pytest.main(["-v", "-m", "unit", "--tb=short", str(PROJECT_ROOT / "tests")]))
 
 if __name__ == "__main__":
     print("=" * 60)
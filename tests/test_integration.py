@@ -24,9 +24,9 @@ class TestCompleteWorkflow:
     """Test complete tutoring workflows from start to finish"""
     
     @pytest.fixture(autouse=True)
-    def setup(self, mock_llm, test_database):
+    def setup(self, mock_llm, test_database, shared_tutoring_system):
         """Setup integrated system components"""
-        self.tutoring_system = AdvancedTutoringSystem()
+        self.tutoring_system = shared_tutoring_system
         self.crud = educational_crud  # Use global instance
         self.session = test_database
         self.cache_manager = cache_manager  # Use global instance
@@ -126,9 +126,9 @@ class TestSystemIntegration:
         # Store in cache using actual method
         cache.set_lesson("python", "basics", "visual", lesson_content, ttl=300)
         
-        # Mock Redis to return pickled data
-        import pickle
-        mock_redis_client.get.return_value = pickle.dumps(lesson_content)
+        # Mock Redis to return the serialized payload
+        import orjson
+        mock_redis_client.get.return_value = orjson.dumps(lesson_content)
         
         # Retrieve from cache
         cached = cache.get_lesson("python", "basics", "visual")
@@ -179,9 +179,9 @@ class TestErrorRecovery:
     """Test system error recovery and resilience"""
     
     @pytest.mark.integration
-    def test_llm_failure_recovery(self):
+    def test_llm_failure_recovery(self, shared_tutoring_system):
         """Test recovery when LLM fails"""
-        system = AdvancedTutoringSystem()
+        system = shared_tutoring_system
         
         # Mock LLM failure and recovery
         with patch.object(system, 'llm_manager') as mock_llm:
@@ -256,21 +256,26 @@ class TestScalabilityPatterns:
     
     @pytest.mark.integration
     @pytest.mark.slow
-    def test_concurrent_user_sessions(self):
-        """Test handling multiple concurrent user sessions"""
+    def test_concurrent_user_sessions(self, shared_tutoring_system):
+        """
+        Test handling multiple concurrent user sessions
+        Each worker used to build its own system; they now share one, as server
+        sessions do, and call its subject detection so the shared system is
+        still exercised from every thread at once
+        """
         import threading
         import queue
         
         results = queue.Queue()
         
-        def create_session(user_id):
+        def create_session(user_id, system):
             try:
-                system = AdvancedTutoringSystem()
                 student = StudentProfile(name=f"User {user_id}")
                 state = create_initial_state(
                     learning_request="Test topic",
                     student_profile=student
                 )
+                system.tutor.detect_subject_and_level(state["learning_request"])
                 
                 # Process session
                 result = {"user_id": user_id, "success": True}
@@ -283,7 +288,7 @@ class TestScalabilityPatterns:
         num_users = 5  # Reduced for faster testing
         
         for i in range(num_users):
-            t = threading.Thread(target=create_session, args=(i,))
+            t = threading.Thread(target=create_session, args=(i, shared_tutoring_system))
             threads.append(t)
             t.start()
         
@@ -372,8 +377,8 @@ class TestDataConsistency:
         test_database.commit()
         
         # Verify consistency
-        import pickle
-        cache.redis_client.get.return_value = pickle.dumps(session_data)
+        import orjson
+        cache.redis_client.get.return_value = orjson.dumps(session_data)
         cached = cache.get_lesson("session", student.student_id, "current_updated")
         
         db_data = test_database.query(LearningSession).filter_by(
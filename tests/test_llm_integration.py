@@ -28,7 +28,6 @@ class TestEducationalLLMManager:
     def test_llm_initialization(self):
         """Test LLM manager initialization"""
         assert self.llm_manager is not None
-        assert hasattr(self.llm_manager, 'openai_model')
         assert self.llm_manager.openai_model == "gpt-3.5-turbo"
     
     @pytest.mark.unit
@@ -144,9 +143,9 @@ class TestLLMIntegration:
         manager = EducationalLLMManager()
         
         # Test that templates are available
-        assert hasattr(manager, 'use_openai')
-        assert hasattr(manager, 'openai_model')
-        assert hasattr(manager, 'use_ollama')
+        assert isinstance(manager.use_openai, bool)
+        assert manager.openai_model
+        assert isinstance(manager.use_ollama, bool)
         
         # Test template generation (mocked)
         with patch.object(manager, 'create_lesson_explanation', new_callable=AsyncMock) as mock_create:
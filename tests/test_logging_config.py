@@ -0,0 +1,103 @@
+"""
+Test suite for logging configuration and sensitive data redaction
+"""
+
+import logging
+import logging.handlers
+import pytest
+
+from utils.logging_config import SensitiveDataFilter, get_logger, setup_logging, stop_logging
+
+
+def make_record(msg, args=()):
+    """Build a log record the way a logger call would"""
+    return logging.LogRecord("llm_requests", logging.INFO, __file__, 1, msg, args, None)
+
+
+class TestSensitiveDataFilter:
+    """Test single-pass secret redaction"""
+
+    @pytest.fixture(autouse=True)
+    def secrets(self, monkeypatch):
+        """Configure two overlapping secrets"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-test-longer")
+        for var in ("HUGGINGFACE_API_KEY", "AWS_SECRET_ACCESS_KEY", "AWS_ACCESS_KEY_ID"):
+            monkeypatch.delenv(var, raising=False)
+
+    @pytest.mark.unit
+    def test_redacts_message_and_args(self):
+        """Secrets are redacted in the message and in positional and mapping args"""
+        sensitive_filter = SensitiveDataFilter()
+        positional = make_record("key=sk-test body=%s n=%d", ("uses sk-test", 3))
+        mapping = make_record("%(key)s", ({"key": "sk-test", "count": 1},))
+
+        assert sensitive_filter.filter(positional) is True
+        assert sensitive_filter.filter(mapping) is True
+
+        assert positional.getMessage() == "key=***REDACTED*** body=uses ***REDACTED*** n=3"
+        assert mapping.args == {"key": "***REDACTED***", "count": 1}
+
+    @pytest.mark.unit
+    def test_longest_secret_redacted_whole(self):
+        """A secret containing another secret is not left partially exposed"""
+        record = make_record("token sk-test-longer")
+
+        SensitiveDataFilter().filter(record)
+
+        assert record.getMessage() == "token ***REDACTED***"
+
+    @pytest.mark.unit
+    def test_full_logging_and_no_secrets_pass_through(self, monkeypatch):
+        """Nothing is rewritten when redaction is disabled or there is nothing to redact"""
+        record = make_record("key=sk-test")
+        SensitiveDataFilter(enable_full_logging=True).filter(record)
+        assert record.getMessage() == "key=sk-test"
+
+        monkeypatch.delenv("OPENAI_API_KEY")
+        monkeypatch.delenv("ANTHROPIC_API_KEY")
+        record = make_record("key=sk-test")
+        SensitiveDataFilter().filter(record)
+        assert record.getMessage() == "key=sk-test"
+
+
+class TestGetLogger:
+    """Test logger lookup"""
+
+    @pytest.mark.unit
+    def test_returns_standard_logger(self):
+        """Cached lookups return the same object as logging.getLogger"""
+        first = get_logger("tests.logging_config")
+
+        assert first is get_logger("tests.logging_config")
+        assert first is logging.getLogger("tests.logging_config")
+
+
+class TestSetupLogging:
+    """Test queued log writers across repeated setup"""
+
+    @pytest.fixture(autouse=True)
+    def restore_logging(self):
+        """Stop writers and restore the root handlers after each test"""
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        yield
+        stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    @pytest.mark.unit
+    def test_reconfigure_keeps_unreplaced_writer(self, tmp_path):
+        """A request logger not reconfigured keeps writing; stop_logging detaches it"""
+        api_logger = logging.getLogger("api_requests")
+        setup_logging(log_dir=str(tmp_path), enable_console=False, log_api_requests=True)
+        setup_logging(log_dir=str(tmp_path), enable_console=False, enable_file_logging=False)
+
+        api_logger.info("after reconfigure")
+        stop_logging()
+
+        api_log = next(tmp_path.glob("api_requests_*.log"))
+        assert "after reconfigure" in api_log.read_text()
+        assert not any(
+            isinstance(h, logging.handlers.QueueHandler) for h in api_logger.handlers
+        )
@@ -9,7 +9,7 @@ from typing import List, Dict, Any
 from pathlib import Path
 
 # Project imports - using actual class names
-from rag.educational_retrieval import EducationalRAG
+from rag.educational_retrieval import EducationalRAG, RetrievedDoc
 
 
 class TestEducationalRAG:
@@ -31,15 +31,473 @@ class TestEducationalRAG:
         assert self.rag.persist_directory is not None
         assert self.rag.initialized is True
     
+    @pytest.mark.unit
+    def test_hnsw_overrides_merge_with_defaults(self, temp_test_dir):
+        """Test partial HNSW settings keep the remaining tuned defaults"""
+        from rag.educational_retrieval import DEFAULT_HNSW_PARAMS
+
+        with patch("chromadb.PersistentClient") as client_cls, \
+                patch("rag.educational_retrieval._get_embedder"):
+            client = client_cls.return_value
+            client.get_collection.side_effect = ValueError("missing")
+            EducationalRAG(
+                persist_directory=str(temp_test_dir / "hnsw"),
+                collection_name="hnsw_collection",
+                collection_metadata={"hnsw:M": 64}
+            )
+
+        metadata = client.create_collection.call_args.kwargs["metadata"]
+        assert metadata["hnsw:M"] == 64
+        assert metadata["hnsw:search_ef"] == DEFAULT_HNSW_PARAMS["hnsw:search_ef"]
+        assert metadata["hnsw:construction_ef"] == DEFAULT_HNSW_PARAMS["hnsw:construction_ef"]
+
     @pytest.mark.unit
     def test_bm25_components(self):
         """Test BM25 component initialization"""
         assert self.rag.bm25_index is None
-        assert self.rag.bm25_corpus == []
-        assert self.rag.bm25_documents == []
+        assert len(self.rag.bm25_documents) == 0
         assert self.rag.bm25_metadatas == []
-        assert self.rag.bm25_ids == []
+        assert len(self.rag.bm25_ids) == 0
     
+    @pytest.mark.unit
+    def test_query_tokens_cached(self):
+        """Test repeated queries reuse the cached tokenization"""
+        first = self.rag._query_tokens("How do Python functions work?")
+        second = self.rag._query_tokens("How do Python functions work?")
+
+        assert first == ("python", "functions", "work")
+        assert second is first
+        assert self.rag._query_tokens.cache_info().hits == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_query_embedding_cached(self):
+        """Test repeated queries are embedded only once"""
+        self.rag.embedder = Mock()
+        self.rag.embedder.encode.side_effect = lambda texts, **kwargs: np.array([[0.1, 0.2, 0.3]] * len(texts))
+        self.rag.query_cache_size = 1
+
+        first = await self.rag._embed_query("python lists")
+        second = await self.rag._embed_query("python lists")
+        third = await self.rag._embed_query("  Python   Lists ")
+        await self.rag._embed_query("python loops")
+
+        assert first is second is third
+        assert first.dtype == np.float32 and not first.flags.writeable
+        np.testing.assert_allclose(first, [0.1, 0.2, 0.3], rtol=1e-6)
+        assert self.rag.embedder.encode.call_count == 2
+        assert list(self.rag._query_embeddings) == ["python loops"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_query_embeddings_batched(self):
+        """Test concurrent cache misses share a single encode call"""
+        import asyncio
+
+        self.rag.embedder = Mock()
+        self.rag.embedder.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text))] for text in texts]
+        )
+
+        embeddings = await asyncio.gather(
+            self.rag._embed_query("a"),
+            self.rag._embed_query("bb"),
+            self.rag._embed_query("ccc"),
+        )
+
+        assert [e.tolist() for e in embeddings] == [[1.0], [2.0], [3.0]]
+        self.rag.embedder.encode.assert_called_once_with(["a", "bb", "ccc"], batch_size=3)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hybrid_search_embeds_query_once(self):
+        """Test both hybrid branches share one query embedding"""
+        self.rag.initialized = True
+        self.rag.bm25_available = False  # keyword branch falls back to semantic
+        self.rag.collection = Mock()
+        self.rag.collection.query.return_value = {
+            "ids": [["doc_1"]], "documents": [["Python lists"]],
+            "metadatas": [[{}]], "distances": [[0.2]]
+        }
+        self.rag.embedder = Mock()
+        self.rag.embedder.encode.side_effect = lambda texts, **kwargs: np.array([[0.1, 0.2, 0.3]] * len(texts))
+
+        results = await self.rag.hybrid_search("python lists", top_k=3)
+
+        assert [r["id"] for r in results] == ["doc_1"]
+        self.rag.embedder.encode.assert_called_once_with(["python lists"], batch_size=1)
+        for call in self.rag.collection.query.call_args_list:
+            [embedding] = call.kwargs["query_embeddings"]
+            assert embedding.dtype == np.float32
+            np.testing.assert_allclose(embedding, [0.1, 0.2, 0.3], rtol=1e-6)
+
+    @pytest.mark.unit
+    def test_fusion_dedups_by_id(self):
+        """Test both fusion methods merge results sharing a document ID"""
+        def results():
+            semantic = [
+                RetrievedDoc(id="doc_1", content="Python lists", metadata={}, score=0.8, source="semantic"),
+                RetrievedDoc(id="doc_2", content="Python loops", metadata={}, score=0.4, source="semantic"),
+            ]
+            keyword = [RetrievedDoc(id="doc_1", content="Python lists", metadata={}, score=0.6, source="bm25")]
+            return semantic, keyword
+
+        # Fusion updates records in place, so each method gets fresh inputs
+        weighted = self.rag._weighted_fusion(*results(), 0.5, 0.5)
+        rrf = self.rag._reciprocal_rank_fusion(*results())
+
+        for combined in (weighted, rrf):
+            assert [doc.id for doc in combined] == ["doc_1", "doc_2"]
+            assert combined[0].sources == ["semantic", "bm25"]
+        assert weighted[0].combined_score == pytest.approx(0.7)
+        assert weighted[0].to_dict()["sources"] == ["semantic", "bm25"]
+
+    @pytest.mark.unit
+    def test_weighted_fusion_filters_and_truncates(self):
+        """Test weighted fusion applies subject filters and top_k in one pass"""
+        semantic = [
+            RetrievedDoc(id="math", content="Derivatives", metadata={"subject": "mathematics"}, score=0.9, source="semantic"),
+            RetrievedDoc(id="lists", content="Python lists", metadata={"subject": "programming"}, score=0.7, source="semantic"),
+            RetrievedDoc(id="loops", content="Python loops", metadata={"subject": "programming"}, score=0.3, source="semantic"),
+        ]
+        keyword = [
+            RetrievedDoc(id="funcs", content="Python functions", metadata={"subject": "programming"}, score=0.8, source="bm25"),
+        ]
+
+        combined = self.rag._weighted_fusion(
+            semantic, keyword, 0.5, 0.5, subject="programming", top_k=2
+        )
+
+        assert [doc.id for doc in combined] == ["funcs", "lists"]
+        assert all(doc.relevance == "medium" for doc in combined)
+
+    @pytest.mark.unit
+    def test_weighted_fusion_minmax_normalization(self):
+        """Test min-max normalization rescales each list before weighting"""
+        semantic = [
+            RetrievedDoc(id="a", content="A", metadata={}, score=0.9, source="semantic"),
+            RetrievedDoc(id="b", content="B", metadata={}, score=0.5, source="semantic"),
+        ]
+        keyword = [
+            RetrievedDoc(id="b", content="B", metadata={}, score=0.4, source="bm25"),
+            RetrievedDoc(id="c", content="C", metadata={}, score=0.1, source="bm25"),
+        ]
+
+        combined = self.rag._weighted_fusion(semantic, keyword, 0.5, 0.5, normalization="minmax")
+
+        assert [doc.id for doc in combined] == ["a", "b", "c"]
+        assert [doc.combined_score for doc in combined] == pytest.approx([0.5, 0.5, 0.0])
+        assert combined[1].semantic_score == 0.5 and combined[1].bm25_score == 0.4
+
+    @pytest.mark.unit
+    def test_rrf_filters_and_truncates(self):
+        """Test RRF keeps list ranks, applies filters and keeps only the top_k"""
+        semantic = [
+            RetrievedDoc(id="math", content="Derivatives", metadata={"subject": "mathematics"}, score=0.9, source="semantic"),
+            RetrievedDoc(id="lists", content="Python lists", metadata={"subject": "programming"}, score=0.7, source="semantic"),
+            RetrievedDoc(id="loops", content="Python loops", metadata={"subject": "programming"}, score=0.3, source="semantic"),
+        ]
+        keyword = [
+            RetrievedDoc(id="loops", content="Python loops", metadata={"subject": "programming"}, score=0.8, source="bm25"),
+        ]
+
+        combined = self.rag._reciprocal_rank_fusion(
+            semantic, keyword, subject="programming", top_k=1
+        )
+
+        assert [doc.id for doc in combined] == ["loops"]
+        assert combined[0].rrf_score == pytest.approx(1 / 63 + 1 / 61)
+        assert (combined[0].semantic_rank, combined[0].bm25_rank) == (3, 1)
+        assert combined[0].sources == ["semantic", "bm25"]
+
+    @pytest.mark.unit
+    def test_rrf_ties_keep_input_order(self):
+        """Test tied RRF scores at the top_k boundary keep semantic-then-BM25 order"""
+        semantic = [
+            RetrievedDoc(id=f"sem{i}", content=f"semantic {i}", metadata={}, score=0.5, source="semantic")
+            for i in range(1, 7)
+        ]
+        keyword = [
+            RetrievedDoc(id=f"bm{i}", content=f"keyword {i}", metadata={}, score=0.5, source="bm25")
+            for i in range(1, 7)
+        ]
+
+        combined = self.rag._reciprocal_rank_fusion(semantic, keyword, top_k=3)
+
+        assert [doc.id for doc in combined] == ["sem1", "bm1", "sem2"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_dense_index_search(self):
+        """Test small corpora are searched in-process without querying ChromaDB"""
+        vectors = {
+            "Python lists": [1.0, 0.0, 0.0],
+            "Python loops": [0.6, 0.8, 0.0],
+            "Derivatives": [0.0, 0.0, 1.0],
+            "lists query": [1.0, 0.1, 0.0],
+        }
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = Mock()
+        self.rag.embedder.encode.side_effect = lambda texts, **kwargs: np.array([vectors[t] for t in texts])
+
+        await self.rag.index_educational_content([
+            {"id": "lists", "text": "Python lists", "metadata": {"subject": "programming"}},
+            {"id": "loops", "text": "Python loops", "metadata": {"subject": "programming"}},
+            {"id": "calc", "text": "Derivatives", "metadata": {"subject": "mathematics"}},
+        ])
+        results = await self.rag.retrieve_educational_content(
+            "lists query", subject="programming", top_k=5
+        )
+
+        if not self.rag.bm25_available:
+            pytest.skip("Dense index rides on the BM25 corpus - scipy missing")
+        self.rag.collection.query.assert_not_called()
+        assert [r["id"] for r in results] == ["lists", "loops"]
+        assert results[0]["score"] > results[1]["score"]
+        assert "embeddings" in self.rag.collection.add.call_args.kwargs
+        index_call = self.rag.embedder.encode.call_args_list[0]
+        assert index_call.args[0] == ["Python lists", "Python loops", "Derivatives"]
+        assert index_call.kwargs["show_progress_bar"] is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reindexing_same_ids_adds_nothing(self):
+        """Test IDs already indexed are skipped, as ChromaDB ignores them"""
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        vectors = {
+            "Python lists": [1.0, 0.0, 0.0],
+            "Python loops": [0.6, 0.8, 0.0],
+            "Derivatives": [0.0, 0.0, 1.0],
+            "lists query": [1.0, 0.1, 0.0],
+        }
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = Mock()
+        self.rag.embedder.encode.side_effect = lambda texts, **kwargs: np.array([vectors[t] for t in texts])
+        content = [
+            {"id": "lists", "text": "Python lists", "metadata": {"subject": "programming"}},
+            {"id": "loops", "text": "Python loops", "metadata": {"subject": "programming"}},
+        ]
+
+        await self.rag.index_educational_content(content)
+        await self.rag.index_educational_content(content + [
+            {"id": "calc", "text": "Derivatives", "metadata": {"subject": "mathematics"}},
+        ])
+        results = await self.rag.retrieve_educational_content("lists query", top_k=5)
+
+        assert list(self.rag.bm25_ids) == ["lists", "loops", "calc"]
+        assert self.rag.bm25_index.corpus_size == 3
+        assert self.rag.dense_embeddings.shape == (3, 3)
+        assert [r["id"] for r in results] == ["lists", "loops", "calc"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_keyword_search_prefilters_by_code(self):
+        """Test BM25 results are restricted by the subject/level code columns"""
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = None
+
+        await self.rag.index_educational_content([
+            {"id": "py", "text": "Python functions return values", "metadata": {"subject": "programming", "level": "beginner"}},
+            {"id": "py_adv", "text": "Python functions and closures", "metadata": {"subject": "programming", "level": "advanced"}},
+            {"id": "calc", "text": "Functions and their derivatives", "metadata": {"subject": "mathematics", "level": "beginner"}},
+        ])
+        results = await self.rag.keyword_search(
+            "functions", subject="programming", student_level="beginner"
+        )
+
+        assert [r["id"] for r in results] == ["py"]
+        assert await self.rag.keyword_search("functions", subject="chemistry") == []
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bm25_scored_off_event_loop(self):
+        """Test BM25 scoring runs in a worker thread so hybrid branches overlap"""
+        import threading
+
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = None
+        await self.rag.index_educational_content([
+            {"id": "py", "text": "Python functions return values", "metadata": {}},
+            {"id": "calc", "text": "Derivatives measure change", "metadata": {}},
+            {"id": "alg", "text": "Linear equations and inverse operations", "metadata": {}},
+        ])
+
+        threads = []
+        get_scores = self.rag.bm25_index.get_scores
+        def record_thread(query):
+            threads.append(threading.get_ident())
+            return get_scores(query)
+
+        with patch.object(self.rag.bm25_index, "get_scores", side_effect=record_thread):
+            results = await self.rag.keyword_search("python")
+
+        assert [r["id"] for r in results] == ["py"]
+        assert threads and threads[0] != threading.get_ident()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_chromadb_queries_bounded(self):
+        """Test concurrent ChromaDB queries are capped by the query semaphore"""
+        import asyncio
+        import threading
+        import time
+
+        self.rag.initialized = True
+        self.rag.embedder = None
+        self.rag.max_concurrent_queries = 2
+        lock = threading.Lock()
+        active, peak = [0], [0]
+        def slow_query(**kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]], "ids": [[]]}
+        self.rag.collection = Mock()
+        self.rag.collection.query.side_effect = slow_query
+
+        await asyncio.gather(*(self.rag.semantic_search(f"query {i}") for i in range(6)))
+
+        assert self.rag.collection.query.call_count == 6
+        assert peak[0] == 2
+
+    @pytest.mark.unit
+    def test_chromadb_queries_bounded_across_event_loops(self):
+        """Test the query cap works when searches run on more than one event loop"""
+        import asyncio
+        import time
+
+        self.rag.initialized = True
+        self.rag.embedder = None
+        self.rag.max_concurrent_queries = 1
+        def slow_query(**kwargs):
+            time.sleep(0.01)
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]], "ids": [[]]}
+        self.rag.collection = Mock()
+        self.rag.collection.query.side_effect = slow_query
+
+        async def burst():
+            await asyncio.gather(*(self.rag.semantic_search(f"query {i}") for i in range(3)))
+
+        # Each asyncio.run is a new loop; the second must not reuse the first's semaphore
+        asyncio.run(burst())
+        asyncio.run(burst())
+
+        assert self.rag.collection.query.call_count == 6
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_filtered_search_while_indexing(self):
+        """Test filtered BM25 searches during an in-flight collection.add see a consistent corpus"""
+        import asyncio
+        import time
+
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = None
+        await self.rag.index_educational_content([
+            {"id": "py", "text": "Python functions return values", "metadata": {"subject": "programming"}},
+            {"id": "calc", "text": "Derivatives measure change", "metadata": {"subject": "mathematics"}},
+            {"id": "alg", "text": "Linear equations and inverse operations", "metadata": {"subject": "mathematics"}},
+            {"id": "geo", "text": "Triangles have three angles", "metadata": {"subject": "mathematics"}},
+            {"id": "stats", "text": "Averages summarize data", "metadata": {"subject": "mathematics"}},
+        ])
+        self.rag.collection.add.side_effect = lambda **kwargs: time.sleep(0.2)
+
+        indexing = asyncio.create_task(self.rag.index_educational_content([
+            {"id": "py2", "text": "Python functions and closures", "metadata": {"subject": "programming"}},
+        ]))
+        await asyncio.sleep(0.05)
+        during = await self.rag.keyword_search("python functions", subject="programming")
+        await indexing
+        after = await self.rag.keyword_search("python functions", subject="programming")
+
+        assert [r["id"] for r in during] == ["py"]
+        assert sorted(r["id"] for r in after) == ["py", "py2"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bm25_index_persisted_and_reloaded(self):
+        """Test the BM25 index is saved on indexing and reloaded while in sync"""
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = None
+
+        await self.rag.index_educational_content([
+            {"id": "py", "text": "Python functions return values", "metadata": {"subject": "programming"}},
+            {"id": "calc", "text": "Derivatives of functions", "metadata": {"subject": "mathematics"}},
+        ])
+        expected = await self.rag.keyword_search("python functions")
+
+        reloaded = EducationalRAG.__new__(EducationalRAG)
+        reloaded.__dict__.update(self.rag.__dict__)
+        reloaded.bm25_index = None
+
+        self.rag.collection.count.return_value = 3
+        assert reloaded._load_bm25() is False
+
+        self.rag.collection.count.return_value = 2
+        assert reloaded._load_bm25() is True
+        assert list(reloaded.bm25_ids) == ["py", "calc"]
+        assert await reloaded.keyword_search("python functions") == expected
+
+        with patch("rag.educational_retrieval.BM25_INDEX_VERSION", 0):
+            assert reloaded._load_bm25() is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bm25_save_writes_its_snapshot(self):
+        """Test a save writes the corpus as of its snapshot and never replaces a newer save"""
+        import json
+
+        if not self.rag.bm25_available:
+            pytest.skip("scipy not installed")
+        self.rag.initialized = True
+        self.rag.collection = Mock()
+        self.rag.embedder = None
+        manifest = self.rag._bm25_dir / "manifest.json"
+
+        await self.rag.index_educational_content([
+            {"id": "py", "text": "Python functions return values", "metadata": {"subject": "programming"}},
+            {"id": "calc", "text": "Derivatives of functions", "metadata": {"subject": "mathematics"}},
+        ])
+        older = self.rag._snapshot_bm25()
+        await self.rag.index_educational_content([
+            {"id": "alg", "text": "Linear equations", "metadata": {"subject": "mathematics"}},
+        ])
+        self.rag._save_bm25(older)
+        assert json.loads(manifest.read_text())["count"] == 3
+
+        # Indexing that lands while a save is in flight stays out of the files
+        snapshot = self.rag._snapshot_bm25()
+        self.rag.bm25_documents.extend(["Triangles have three angles"])
+        self.rag.bm25_ids.append("geo")
+        self.rag._build_bm25_index([["triangles", "three", "angles"]])
+        self.rag._save_bm25(snapshot)
+
+        reloaded = EducationalRAG.__new__(EducationalRAG)
+        reloaded.__dict__.update(self.rag.__dict__)
+        self.rag.collection.count.return_value = 3
+        assert json.loads(manifest.read_text())["count"] == 3
+        assert reloaded._load_bm25() is True
+        assert reloaded.bm25_ids == ["py", "calc", "alg"]
+        assert len(reloaded.bm25_documents) == reloaded.bm25_index.corpus_size == 3
+
     @pytest.mark.unit
     @pytest.mark.asyncio
     async def test_add_content(self):
@@ -85,6 +543,250 @@ class TestEducationalRAG:
             assert results[0]["score"] == 0.95
 
 
+class TestSparseBM25:
+    """Test the vectorized BM25 scorer"""
+
+    CORPUS = [
+        ["python", "lists", "ordered", "mutable", "collections"],
+        ["python", "loops", "iterate", "lists", "tuples", "strings"],
+        ["derivatives", "measure", "rate", "change", "function"],
+        ["linear", "equations", "isolate", "inverse", "operations"],
+    ]
+
+    # rank_bm25.BM25Okapi(CORPUS).get_scores(query), recorded so the check
+    # runs without the rank-bm25 package
+    BM25OKAPI_SCORES = {
+        ("python", "lists"): [0.0, 0.0, 0.0, 0.0],
+        ("function", "rate"): [0.0, 0.0, 1.73170366, 0.0],
+        ("python", "python"): [0.0, 0.0, 0.0, 0.0],
+        ("ordered", "lists", "loops"): [0.86585183, 0.79611879, 0.0, 0.0],
+        ("inverse", "inverse", "rate"): [0.0, 0.0, 0.86585183, 1.73170366],
+    }
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("query", list(BM25OKAPI_SCORES), ids=" ".join)
+    def test_scores_match_bm25okapi(self, query):
+        """Scores should match the reference rank-bm25 implementation"""
+        from rag.educational_retrieval import SparseBM25
+
+        scorer = SparseBM25(self.CORPUS)
+
+        np.testing.assert_allclose(
+            scorer.get_scores(list(query)),
+            self.BM25OKAPI_SCORES[query],
+            rtol=1e-5, atol=1e-7
+        )
+
+    @pytest.mark.unit
+    def test_unknown_terms_score_zero(self):
+        """Queries with no known terms should score every document zero"""
+        from rag.educational_retrieval import SparseBM25
+
+        scores = SparseBM25(self.CORPUS).get_scores(["quantum"])
+
+        assert scores.shape == (len(self.CORPUS),)
+        assert not scores.any()
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("query", [["python", "lists"], ["function", "rate"]], ids=" ".join)
+    def test_incremental_add_matches_full_build(self, query):
+        """Appending documents should score the same as building in one go"""
+        from rag.educational_retrieval import SparseBM25
+
+        full = SparseBM25(self.CORPUS)
+        incremental = SparseBM25(self.CORPUS[:2])
+        incremental.add_documents(self.CORPUS[2:])
+
+        np.testing.assert_allclose(
+            incremental.get_scores(query),
+            full.get_scores(query),
+            rtol=1e-6
+        )
+
+
+    @pytest.mark.unit
+    def test_add_documents_leaves_old_snapshot_intact(self):
+        """A scorer holding the previous state keeps consistent arrays after an add"""
+        from rag.educational_retrieval import SparseBM25
+
+        scorer = SparseBM25(self.CORPUS[:2])
+        before = scorer._state
+        expected = scorer.get_scores(["python", "lists"])
+        scorer.add_documents(self.CORPUS[2:] + [["python", "quantum"]])
+
+        assert before.tf.shape == (2, len(before.vocab))
+        assert "quantum" not in before.vocab
+        assert len(before.doc_len) == len(before.len_norm) == 2
+        assert scorer.corpus_size == 5
+        scorer._state = before
+        np.testing.assert_array_equal(scorer.get_scores(["python", "lists"]), expected)
+
+class TestDocumentBuffer:
+    """Test the offset-indexed document store"""
+
+    @pytest.mark.unit
+    def test_round_trips_text(self):
+        """Stored strings, including non-ASCII ones, should decode unchanged"""
+        from rag.educational_retrieval import DocumentBuffer
+
+        texts = ["Python lists", "", "Dérivées et intégrales", "∑ notation"]
+        buffer = DocumentBuffer(texts[:2])
+        buffer.extend(texts[2:])
+
+        assert len(buffer) == 4
+        assert list(buffer) == texts
+        assert buffer[-1] == "∑ notation"
+        with pytest.raises(IndexError):
+            buffer[4]
+
+
+class TestEmbeddingBatcher:
+    """Test coalescing of concurrent query embeddings"""
+
+    @pytest.mark.unit
+    def test_recovers_after_event_loop_closes(self):
+        """A loop closed before its flush fired must not strand later callers"""
+        import asyncio
+        from rag.educational_retrieval import EmbeddingBatcher
+
+        batcher = EmbeddingBatcher(lambda texts: [[float(len(t))] for t in texts])
+
+        async def abandoned():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(batcher.encode("a"), 0.001)
+
+        asyncio.run(abandoned())
+        result = asyncio.run(asyncio.wait_for(batcher.encode("abc"), 5))
+
+        assert result == [3.0]
+
+
+class TestModelCache:
+    """Test process-wide model sharing"""
+
+    @pytest.mark.unit
+    def test_embedder_loaded_once_per_device(self):
+        """Repeated lookups should reuse the loaded model"""
+        pytest.importorskip("sentence_transformers")
+        from rag.educational_retrieval import _get_embedder
+
+        _get_embedder.cache_clear()
+        with patch("sentence_transformers.SentenceTransformer") as model_cls:
+            first = _get_embedder("all-MiniLM-L6-v2", "cpu")
+            second = _get_embedder("all-MiniLM-L6-v2", "cpu")
+
+        assert first is second
+        model_cls.assert_called_once_with("all-MiniLM-L6-v2", device="cpu")
+        _get_embedder.cache_clear()
+
+    @pytest.mark.unit
+    def test_onnx_embedder_falls_back_to_pytorch(self):
+        """A failed ONNX load should fall back to the PyTorch model"""
+        pytest.importorskip("sentence_transformers")
+        from rag.educational_retrieval import _get_embedder, ONNX_QUANTIZED_FILE
+
+        def load(name, device, backend="torch", **kwargs):
+            if backend == "onnx":
+                raise ImportError("optimum not installed")
+            return Mock()
+
+        _get_embedder.cache_clear()
+        with patch("sentence_transformers.SentenceTransformer", side_effect=load) as model_cls:
+            model = _get_embedder("all-MiniLM-L6-v2", "cpu", True)
+
+        assert model is not None
+        assert model_cls.call_args_list[0].kwargs["model_kwargs"] == {"file_name": ONNX_QUANTIZED_FILE}
+        assert model_cls.call_args_list[1].kwargs == {"device": "cpu"}
+        _get_embedder.cache_clear()
+
+    @pytest.mark.unit
+    def test_cross_encoder_fp16_cached_separately(self):
+        """FP16 and FP32 cross-encoders should never share a model"""
+        pytest.importorskip("sentence_transformers")
+        from rag.educational_retrieval import _get_cross_encoder
+
+        _get_cross_encoder.cache_clear()
+        with patch("sentence_transformers.CrossEncoder", side_effect=lambda *a, **kw: Mock()):
+            fp32 = _get_cross_encoder("cross-encoder/test", "cuda")
+            fp16 = _get_cross_encoder("cross-encoder/test", "cuda", True)
+
+        assert fp32 is not fp16
+        fp32.model.half.assert_not_called()
+        fp16.model.half.assert_called_once()
+        _get_cross_encoder.cache_clear()
+
+    @pytest.mark.unit
+    def test_cross_encoder_onnx_backend(self):
+        """The ONNX cross-encoder should load the quantized graph and skip FP16"""
+        pytest.importorskip("sentence_transformers")
+        from rag.educational_retrieval import _get_cross_encoder, ONNX_QUANTIZED_FILE
+
+        _get_cross_encoder.cache_clear()
+        with patch("sentence_transformers.CrossEncoder", side_effect=lambda *a, **kw: Mock()) as model_cls:
+            onnx = _get_cross_encoder("cross-encoder/test", "cpu", onnx=True)
+
+        model_cls.assert_called_once_with(
+            "cross-encoder/test", device="cpu", backend="onnx",
+            model_kwargs={"file_name": ONNX_QUANTIZED_FILE}
+        )
+        onnx.model.half.assert_not_called()
+        _get_cross_encoder.cache_clear()
+
+
+class TestEducationalReranker:
+    """Test suite for the cross-encoder reranker"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup reranker with a mocked cross-encoder"""
+        from rag.educational_retrieval import EducationalReranker
+
+        with patch("rag.educational_retrieval._get_cross_encoder") as factory:
+            factory.return_value = Mock()
+            self.reranker = EducationalReranker(batch_size=2)
+        self.cross_encoder = self.reranker.cross_encoder
+
+    @pytest.mark.unit
+    def test_predict_in_length_order(self):
+        """Pairs are scored shortest-first and scores map back to candidates"""
+        candidates = [
+            {"content": "a much longer document about python lists"},
+            {"content": "short"},
+            {"content": "medium length doc"},
+        ]
+        # Scores returned in the length-sorted order: short, medium, long
+        self.cross_encoder.predict.return_value = np.array([1.0, 2.0, 3.0])
+
+        reranked = self.reranker.rerank_for_learning(candidates, "python", normalize=False)
+
+        pairs = self.cross_encoder.predict.call_args.args[0]
+        assert [doc for _, doc in pairs] == ["short", "medium length doc", candidates[0]["content"]]
+        assert self.cross_encoder.predict.call_args.kwargs["batch_size"] == 2
+        assert self.cross_encoder.predict.call_args.kwargs["show_progress_bar"] is False
+        assert [c["rerank_score"] for c in reranked] == [3.0, 2.0, 1.0]
+        assert reranked[0]["content"].startswith("a much longer")
+
+    @pytest.mark.unit
+    def test_top_k_keeps_best_in_order(self):
+        """top_k returns only the highest-scoring candidates, best first"""
+        candidates = [{"content": text} for text in ("aaaa", "bb", "ccc", "d")]
+        # Length order: d, bb, ccc, aaaa
+        self.cross_encoder.predict.return_value = np.array([0.5, 4.0, 2.0, 3.0])
+
+        reranked = self.reranker.rerank_for_learning(candidates, "q", top_k=2, normalize=False)
+
+        assert [c["content"] for c in reranked] == ["bb", "aaaa"]
+
+    @pytest.mark.unit
+    def test_normalize_scores(self):
+        """Sigmoid normalization maps logits into 0-1, even extreme ones"""
+        normalized = self.reranker._normalize_scores(np.array([-1000.0, 0.0, 1000.0]))
+
+        assert normalized[0] == pytest.approx(0.0)
+        assert normalized[1] == pytest.approx(0.5)
+        assert normalized[2] == pytest.approx(1.0)
+
+
 class TestDocumentProcessing:
     """Test document processing functionality"""
     
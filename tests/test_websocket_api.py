@@ -179,12 +179,14 @@ class TestSessionManagement:
         
         assert len(sessions) == 3
         
-        # Send message to each session
-        for i, session in enumerate(sessions):
-            await session.send_message({
+        # Send message to each session concurrently
+        await asyncio.gather(*(
+            session.send_message({
                 "type": "test",
                 "session": i
             })
+            for i, session in enumerate(sessions)
+        ))
         
         # Verify each websocket received one message
         for session in sessions: